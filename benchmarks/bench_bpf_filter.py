@@ -0,0 +1,106 @@
+"""bench_bpf_filter.py :: CPU used by an idle SSDP server on a noisy network.
+
+Multicasts the traffic in `ssdp_corpus.json` to the SSDP group at a fixed
+rate, as a LAN full of Chromecasts, Sonos speakers and printers would, while
+a separate process runs an `SSDPServer` on a socket from `make_udp_sock`,
+first as is and then with `attach_search_filter`. Reports how many datagrams
+reached the server and the CPU time its process used. Linux only; needs port
+1900 to be free, i.e. Fauxmo not running.
+
+Usage: python benchmarks/bench_bpf_filter.py [--rate N] [--duration SECONDS]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import pathlib
+import socket
+import time
+import typing as t
+from multiprocessing import Pipe, Process
+from multiprocessing.connection import Connection
+
+from fauxmo import metrics
+from fauxmo.protocols import SSDPServer
+from fauxmo.responses import SSDP_GROUP, SSDP_PORT
+from fauxmo.utils import attach_search_filter, make_udp_sock
+
+
+def serve(filtered: bool, duration: float, conn: Connection) -> None:
+    """Run an SSDP server for `duration` and report what it cost."""
+    sock = make_udp_sock()
+    if filtered and not attach_search_filter(sock):
+        raise SystemExit("Unable to attach filter")
+
+    server = SSDPServer()
+    server.add_device("bench", "127.0.0.1", 50000)
+
+    async def run() -> None:
+        loop = asyncio.get_running_loop()
+        await loop.create_datagram_endpoint(lambda: server, sock=sock)
+        conn.send("ready")
+        await asyncio.sleep(duration)
+        server.transport.close()
+
+    start = time.process_time()
+    asyncio.run(run())
+    conn.send(
+        (
+            metrics.ssdp_datagrams_total.values.get((), 0),
+            time.process_time() - start,
+        )
+    )
+
+
+def generate(datagrams: t.List[bytes], rate: int, duration: float) -> int:
+    """Multicast `datagrams` round robin at `rate` per second."""
+    sent = 0
+    interval = 1 / rate
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        start = time.monotonic()
+        while (now := time.monotonic()) - start < duration:
+            sock.sendto(
+                datagrams[sent % len(datagrams)], (SSDP_GROUP, SSDP_PORT)
+            )
+            sent += 1
+            time.sleep(max(0, start + sent * interval - now))
+    return sent
+
+
+def main() -> None:
+    """Measure an unfiltered and a filtered server and print the results."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rate", type=int, default=2000)
+    parser.add_argument("--duration", type=float, default=5.0)
+    args = parser.parse_args()
+
+    corpus = json.loads(
+        pathlib.Path(__file__).with_name("ssdp_corpus.json").read_text()
+    )
+    datagrams = [
+        entry["datagram"].encode()
+        for entry in corpus
+        for _ in range(entry["count"])
+    ]
+
+    for filtered in (False, True):
+        parent, child = Pipe()
+        process = Process(
+            target=serve, args=(filtered, args.duration + 0.5, child)
+        )
+        process.start()
+        parent.recv()
+        sent = generate(datagrams, args.rate, args.duration)
+        received, cpu = parent.recv()
+        process.join()
+        print(
+            f"{'filtered' if filtered else 'unfiltered':>10}: "
+            f"{received:6d} of {sent} datagrams reached the server, "
+            f"{cpu:.3f} s CPU"
+        )
+
+
+if __name__ == "__main__":
+    main()
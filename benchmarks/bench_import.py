@@ -0,0 +1,140 @@
+"""bench_import.py :: Cold start cost: imports and time to first SSDP response.
+
+Runs `python -X importtime -c "import fauxmo.cli"` and reports the
+cumulative import time of `fauxmo.cli` along with the slowest modules it
+imports. With `--baseline`, `fauxmo.cli` is also imported from another source
+tree, e.g. a `git worktree` of an earlier commit, alternating with the runs
+of the installed one so that both see the same machine load. Then starts
+`fauxmo` with a single `CommandLinePlugin` device and sends it an `M-SEARCH`
+every few milliseconds until the first response, reporting the time from
+launching the process. Needs port 1900 to be free, i.e. Fauxmo not running.
+
+Usage: python benchmarks/bench_import.py [--runs N] [--top N]
+                                         [--baseline SRC_DIR]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import typing as t
+
+SEARCH = (
+    b"M-SEARCH * HTTP/1.1\r\n"
+    b"HOST: 239.255.255.250:1900\r\n"
+    b'MAN: "ssdp:discover"\r\n'
+    b"MX: 0\r\n"
+    b"ST: urn:Belkin:device:**\r\n"
+    b"\r\n"
+)
+
+
+def import_times(src: str | None = None) -> t.Dict[str, t.Tuple[int, int]]:
+    """Return the self and cumulative import time in us of each module.
+
+    Args:
+        src: Directory to import `fauxmo` from, if not the installed one
+
+    """
+    env = dict(os.environ)
+    if src is not None:
+        env["PYTHONPATH"] = src
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import fauxmo.cli"],
+        capture_output=True,
+        check=True,
+        env=env,
+        text=True,
+    ).stderr
+
+    times = {}
+    for line in stderr.splitlines()[1:]:
+        self_us, cumulative_us, module = line.split(":", 1)[1].split("|")
+        times[module.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def first_response(config_path: str) -> float:
+    """Start fauxmo and return the seconds until it answers a search."""
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.settimeout(0.005)
+        start = time.perf_counter()
+        process = subprocess.Popen(
+            [sys.executable, "-m", "fauxmo.cli", "-c", config_path],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            while process.poll() is None:
+                sock.sendto(SEARCH, ("127.0.0.1", 1900))
+                try:
+                    sock.recv(4096)
+                except (socket.timeout, ConnectionRefusedError):
+                    continue
+                return time.perf_counter() - start
+            raise RuntimeError("fauxmo exited before responding")
+        finally:
+            process.terminate()
+            process.wait()
+
+
+def main() -> None:
+    """Report import times and time to first SSDP response."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--baseline")
+    args = parser.parse_args()
+
+    runs = []
+    baseline_runs = []
+    for _ in range(args.runs):
+        runs.append(import_times())
+        if args.baseline:
+            baseline_runs.append(import_times(args.baseline))
+    cli_ms = statistics.median(run["fauxmo.cli"][1] for run in runs) / 1e3
+    print(f"import fauxmo.cli: {cli_ms:.1f} ms (median of {args.runs})")
+    if baseline_runs:
+        baseline_ms = (
+            statistics.median(run["fauxmo.cli"][1] for run in baseline_runs)
+            / 1e3
+        )
+        print(f"          baseline: {baseline_ms:.1f} ms")
+
+    slowest = sorted(runs[-1].items(), key=lambda item: -item[1][0])
+    for module, (self_us, cumulative_us) in slowest[: args.top]:
+        print(f"  {module:<32} {self_us / 1e3:6.1f} ms self")
+
+    config = {
+        "FAUXMO": {"ip_address": "127.0.0.1", "ssdp_notify": False},
+        "PLUGINS": {
+            "CommandLinePlugin": {
+                "DEVICES": [
+                    {
+                        "name": "bench",
+                        "port": 0,
+                        "on_cmd": "true",
+                        "off_cmd": "true",
+                    }
+                ]
+            }
+        },
+    }
+    with tempfile.NamedTemporaryFile("w", suffix=".json") as f:
+        json.dump(config, f)
+        f.flush()
+        response_ms = statistics.median(
+            first_response(f.name) * 1e3 for _ in range(args.runs)
+        )
+    print(f"first SSDP response: {response_ms:.1f} ms (median)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""bench_logging.py :: Cost of hot-path debug logging while it is disabled.
+
+Compares eagerly formatted f-string messages with lazily formatted `%`-style
+messages for the payloads Fauxmo logs on every SSDP datagram and HTTP
+response, with the logger at its default INFO level.
+
+Usage: python benchmarks/bench_logging.py [--number N]
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import timeit
+
+from fauxmo import ssdp_logger
+from fauxmo.responses import DeviceResponses
+
+DATAGRAM = (
+    "M-SEARCH * HTTP/1.1\r\n"
+    "HOST: 239.255.255.250:1900\r\n"
+    'MAN: "ssdp:discover"\r\n'
+    "MX: 3\r\n"
+    "ST: urn:Belkin:device:**\r\n"
+    "\r\n"
+)
+ADDR = ("192.168.0.10", 50000)
+RESPONSE = DeviceResponses("benchmark device").setup.render()
+
+
+def eager_ssdp() -> None:
+    """Log a datagram the way `SSDPServer` used to."""
+    ssdp_logger.debug(f"Received data below from {ADDR}:")
+    ssdp_logger.debug(DATAGRAM)
+
+
+def lazy_ssdp() -> None:
+    """Log a datagram the way `SSDPServer` does now."""
+    ssdp_logger.debug("Received data below from %s:\n%s", ADDR, DATAGRAM)
+
+
+def eager_response() -> None:
+    """Log a response the way `Fauxmo.send_response` used to."""
+    ssdp_logger.debug(f"Fauxmo response:\n{RESPONSE!r}")
+
+
+def lazy_response() -> None:
+    """Log a response the way `Fauxmo.send_response` does now."""
+    ssdp_logger.debug("Fauxmo response:\n%r", RESPONSE)
+
+
+def main() -> None:
+    """Time each variant and print the cost per call."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=200_000)
+    args = parser.parse_args()
+
+    logging.getLogger("fauxmo").setLevel(logging.INFO)
+    assert not ssdp_logger.isEnabledFor(logging.DEBUG)
+
+    for func in (eager_ssdp, lazy_ssdp, eager_response, lazy_response):
+        best = min(timeit.repeat(func, number=args.number, repeat=5))
+        print(f"{func.__name__:>16}: {best / args.number * 1e9:8.1f} ns/call")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""bench_ssdp_filter.py :: Cost of ignoring the SSDP traffic on a busy LAN.
+
+Replays `ssdp_corpus.json`, a mix of the `NOTIFY`s and searches seen on port
+1900 of a network with Chromecasts, Sonos speakers and printers and the
+occasional Echo search, through the datagram handler as it used to be
+(decode, log, lower-case and scan with regular expressions) and through
+`SSDPServer.datagram_received`. Searches that would be answered are counted
+but not answered, so only the filtering is timed. With `--debug`, SSDP
+tracing is enabled (to a handler that discards it), as with `fauxmo -vvv`.
+
+Usage: python benchmarks/bench_ssdp_filter.py [--number N] [--corpus PATH]
+                                              [--debug]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import pathlib
+import re
+import timeit
+import typing as t
+
+from fauxmo import ssdp_logger
+from fauxmo.protocols import SSDPServer
+
+SEARCH_TARGET_HEADER = re.compile(
+    r"(?<![a-z-])ST:[ \t]*(\S+)", flags=re.IGNORECASE
+)
+MX_HEADER = re.compile(
+    r"(?<![a-z-])MX:[ \t]*(\d+(?:\.\d*)?)", flags=re.IGNORECASE
+)
+
+Address = t.Tuple[str, int]
+
+
+class CountingSSDPServer(SSDPServer):
+    """Counts the searches it would answer instead of answering them."""
+
+    answered = 0
+
+    def respond_to_search(
+        self, addr: Address, search_target: str, mx: float = 0.0
+    ) -> None:
+        """Count a search."""
+        self.answered += 1
+
+
+def legacy_datagram_received(
+    server: CountingSSDPServer, data: bytes, addr: Address
+) -> None:
+    """Filter a datagram the way `datagram_received` used to."""
+    text = data.decode("utf8")
+    ssdp_logger.debug("Received data below from %s:\n%s", addr, text)
+
+    if 'man: "ssdp:discover"' not in text.lower():
+        return
+
+    match = SEARCH_TARGET_HEADER.search(text)
+    if match is None or match[1] not in server.search_responses:
+        return
+
+    mx = 0.0
+    mx_match = MX_HEADER.search(text)
+    if mx_match:
+        mx = float(mx_match[1])
+    server.respond_to_search(addr, match[1], mx)
+
+
+def main() -> None:
+    """Time both handlers over the corpus and print the cost."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=200)
+    parser.add_argument(
+        "--corpus",
+        type=pathlib.Path,
+        default=pathlib.Path(__file__).with_name("ssdp_corpus.json"),
+    )
+    parser.add_argument("--debug", action="store_true")
+    args = parser.parse_args()
+
+    if args.debug:
+        ssdp_logger.setLevel(logging.DEBUG)
+        ssdp_logger.addHandler(logging.NullHandler())
+        ssdp_logger.propagate = False
+
+    corpus = json.loads(args.corpus.read_text())
+    datagrams = [
+        entry["datagram"].encode()
+        for entry in corpus
+        for _ in range(entry["count"])
+    ]
+    addr = ("192.168.1.20", 1900)
+
+    server = CountingSSDPServer()
+    for idx in range(10):
+        server.add_device(f"device {idx}", "192.168.1.2", 50000 + idx)
+
+    def legacy() -> None:
+        for data in datagrams:
+            legacy_datagram_received(server, data, addr)
+
+    def prefiltered() -> None:
+        for data in datagrams:
+            server.datagram_received(data, addr)
+
+    for name, func in (("legacy", legacy), ("prefiltered", prefiltered)):
+        server.answered = 0
+        best = min(timeit.repeat(func, number=args.number, repeat=5))
+        print(
+            f"{name:>12}: {best / args.number / len(datagrams) * 1e6:6.2f} us "
+            f"per datagram, {server.answered // (5 * args.number)} of "
+            f"{len(datagrams)} answered"
+        )
+
+
+if __name__ == "__main__":
+    main()
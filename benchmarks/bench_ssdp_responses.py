@@ -0,0 +1,80 @@
+"""bench_ssdp_responses.py :: Cost of building the responses to an M-SEARCH.
+
+Compares rendering every device's response from scratch, as
+`SSDPServer.respond_to_search` used to, with filling in the pre-rendered
+`SearchResponse` of each device.
+
+Usage: python benchmarks/bench_ssdp_responses.py [--devices N] [--number N]
+"""
+
+from __future__ import annotations
+
+import argparse
+import timeit
+import typing as t
+import uuid
+from email.utils import formatdate
+
+from fauxmo.protocols import SSDPServer
+from fauxmo.utils import make_serial
+
+ST = "urn:Belkin:device:**"
+
+
+def legacy_responses(devices: t.List[dict]) -> t.List[bytes]:
+    """Render every device's response the way it used to be done."""
+    date_str = formatdate(timeval=None, localtime=False, usegmt=True)
+    responses = []
+    for device in devices:
+        location = (
+            f"http://{device['ip_address']}:{device['port']}"
+            f"{device['base_path']}/setup.xml"
+        )
+        usn = f"uuid:Socket-1_0-{make_serial(device['name'])}::{ST}"
+        response = "\r\n".join(
+            [
+                "HTTP/1.1 200 OK",
+                "CACHE-CONTROL: max-age=86400",
+                f"DATE: {date_str}",
+                "EXT:",
+                f"LOCATION: {location}",
+                'OPT: "http://schemas.upnp.org/upnp/1/0/"; ns=01',
+                f"01-NLS: {uuid.uuid4()}",
+                "SERVER: Fauxmo, UPnP/1.0, Unspecified",
+                f"ST: {ST}",
+                f"USN: {usn}",
+            ]
+        ) + (2 * "\r\n")
+        responses.append(response.encode("utf8"))
+    return responses
+
+
+def prerendered_responses(server: SSDPServer) -> t.List[bytes]:
+    """Fill in every device's pre-rendered response."""
+    return [response.render() for response in server.search_responses[ST]]
+
+
+def main() -> None:
+    """Time both approaches for one search and print the cost."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--devices", type=int, default=300)
+    parser.add_argument("--number", type=int, default=200)
+    args = parser.parse_args()
+
+    server = SSDPServer()
+    for idx in range(args.devices):
+        server.add_device(f"device {idx}", "192.168.0.2", 50000 + idx)
+
+    for name, func in (
+        ("legacy", lambda: legacy_responses(server.devices)),
+        ("prerendered", lambda: prerendered_responses(server)),
+    ):
+        best = min(timeit.repeat(func, number=args.number, repeat=5))
+        print(
+            f"{name:>12}: {best / args.number * 1e3:8.3f} ms per search of "
+            f"{args.devices} devices"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""bench_startup.py :: Time to start the TCP servers of many devices.
+
+Compares starting a server per device the way `fauxmo.main` used to (probe
+for a free port with `get_unused_port`, then run `create_server` to
+completion, one device at a time) with binding every server to port 0 at
+once with `fauxmo.start_server` and `asyncio.gather`. Exits with a non-zero
+status if the concurrent startup takes longer than `--target` seconds.
+
+Usage: python benchmarks/bench_startup.py [--devices N] [--target SECONDS]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import resource
+import sys
+import time
+import typing as t
+
+from fauxmo.fauxmo import start_server
+from fauxmo.utils import get_unused_port
+
+HOSTS = ["127.0.0.1"]
+
+
+def legacy(loop: asyncio.AbstractEventLoop, devices: int) -> t.List:
+    """Start the servers one at a time on probed ports."""
+    servers = []
+    for _ in range(devices):
+        coro = loop.create_server(
+            asyncio.Protocol, host=HOSTS, port=get_unused_port(), backlog=100
+        )
+        servers.append(loop.run_until_complete(coro))
+    return servers
+
+
+def concurrent(loop: asyncio.AbstractEventLoop, devices: int) -> t.List:
+    """Start the servers at once on port 0."""
+    started = loop.run_until_complete(
+        asyncio.gather(
+            *(
+                start_server(asyncio.Protocol, HOSTS, 0, 100)
+                for _ in range(devices)
+            )
+        )
+    )
+    return [server for servers, _ in started for server in servers]
+
+
+def main() -> None:
+    """Time both approaches and check the concurrent one against a target."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--devices", type=int, default=1000)
+    parser.add_argument("--target", type=float, default=0.5)
+    args = parser.parse_args()
+
+    # One listening socket per device
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    wanted = args.devices + 100
+    if soft < wanted:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (min(wanted, hard), hard))
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    results = {}
+    for name, func in (("legacy", legacy), ("concurrent", concurrent)):
+        start = time.perf_counter()
+        servers = func(loop, args.devices)
+        results[name] = time.perf_counter() - start
+        print(
+            f"{name:>10}: {results[name]:.3f} s to start {len(servers)} "
+            "device servers"
+        )
+        for server in servers:
+            server.close()
+            loop.run_until_complete(server.wait_closed())
+    loop.close()
+
+    if results["concurrent"] > args.target:
+        print(f"Slower than the target of {args.target} s")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
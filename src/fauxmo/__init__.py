@@ -15,3 +15,14 @@ logging.basicConfig(
 logger = logging.getLogger("fauxmo")
 syslog_handler = logging.handlers.SysLogHandler()
 logger.addHandler(syslog_handler)
+
+# Per-category loggers for protocol tracing, which inherit the level of
+# `logger` unless enabled individually with `debug_categories` in the config
+ssdp_logger = logging.getLogger("fauxmo.ssdp")
+http_logger = logging.getLogger("fauxmo.http")
+plugin_logger = logging.getLogger("fauxmo.plugin")
+LOG_CATEGORIES = {
+    "ssdp": ssdp_logger,
+    "http": http_logger,
+    "plugin": plugin_logger,
+}
@@ -0,0 +1,220 @@
+"""admission.py :: Limit connections and request rates for device servers.
+
+A misbehaving client on the LAN can otherwise open connections or send
+requests as fast as the event loop accepts them, starving discovery and the
+other devices. The `AdmissionController` is shared by all device servers and
+is consulted when a connection is made and for each request it carries.
+"""
+
+from __future__ import annotations
+
+import time
+import typing as t
+
+from fauxmo import http_logger, metrics
+
+# Forget the token buckets of idle clients once there are this many
+MAX_TRACKED_CLIENTS = 1024
+
+# Warn about a client's rejections at most once in this many seconds
+REJECTION_WARNING_INTERVAL = 60.0
+
+
+class TokenBucket:
+    """Allow `rate` events per second on average, in bursts up to `burst`."""
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float) -> None:
+        """Initialize a full TokenBucket.
+
+        Args:
+            rate: Tokens added per second
+            burst: Maximum number of tokens
+
+        """
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def refill(self, now: float) -> float:
+        """Add the tokens accrued since the last update and return the total.
+
+        Args:
+            now: Current time, from `time.monotonic`
+
+        """
+        elapsed = now - self.updated
+        self.tokens = min(self.burst, self.tokens + elapsed * self.rate)
+        self.updated = now
+        return self.tokens
+
+    def take(self, now: float) -> bool:
+        """Take a token if one is available.
+
+        Args:
+            now: Current time, from `time.monotonic`
+
+        Returns:
+            Whether a token was taken
+
+        """
+        if self.refill(now) >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+class AdmissionController:
+    """Enforce connection caps and a per-client request rate.
+
+    Every limit is optional; with none set, everything is admitted.
+    """
+
+    def __init__(
+        self,
+        max_connections: int | None = None,
+        max_connections_per_device: int | None = None,
+        rate: float | None = None,
+        burst: float | None = None,
+    ) -> None:
+        """Initialize an AdmissionController.
+
+        Args:
+            max_connections: Maximum open connections across all devices
+            max_connections_per_device: Maximum open connections per device
+                                        server
+            rate: Requests per second allowed from each source IP address
+            burst: Requests a source IP address may send at once before
+                   being held to `rate`; defaults to `rate`, at least 1
+
+        """
+        self.max_connections = max_connections
+        self.max_connections_per_device = max_connections_per_device
+        self.rate = rate
+        self.burst = max(1.0, burst if burst is not None else rate or 1.0)
+        self.connections = 0
+        self.device_connections: t.Dict[str, int] = {}
+        self._buckets: t.Dict[str, TokenBucket] = {}
+        # Per client, when its rejections were last warned about and how
+        # many there have been since
+        self._warned: t.Dict[str, t.Tuple[float, int]] = {}
+
+    def admit(self, device: str | None, host: str) -> bool:
+        """Decide whether to accept a new connection, and count it if so.
+
+        Args:
+            device: Name of the device whose server accepted the connection,
+                    or `None` if it serves several devices
+            host: Source IP address of the connection
+
+        Returns:
+            Whether the connection was admitted; if so, `release` must be
+            called when it is closed
+
+        """
+        if (
+            self.max_connections is not None
+            and self.connections >= self.max_connections
+        ):
+            self._reject("connection_limit", host, device)
+            return False
+
+        if device is not None and self.max_connections_per_device is not None:
+            if (
+                self.device_connections.get(device, 0)
+                >= self.max_connections_per_device
+            ):
+                self._reject("device_connection_limit", host, device)
+                return False
+
+        self.connections += 1
+        if device is not None:
+            self.device_connections[device] = (
+                self.device_connections.get(device, 0) + 1
+            )
+        return True
+
+    def release(self, device: str | None) -> None:
+        """Stop counting a closed connection admitted by `admit`.
+
+        Args:
+            device: As passed to `admit`
+
+        """
+        self.connections -= 1
+        if device is not None:
+            remaining = self.device_connections[device] - 1
+            if remaining:
+                self.device_connections[device] = remaining
+            else:
+                del self.device_connections[device]
+
+    def allow_request(self, device: str | None, host: str) -> bool:
+        """Decide whether a request from `host` is within its rate limit.
+
+        Args:
+            device: Name of the device, for logging, if known
+            host: Source IP address of the request
+
+        Returns:
+            Whether the request may be handled
+
+        """
+        if self.rate is None:
+            return True
+
+        now = time.monotonic()
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            if len(self._buckets) >= MAX_TRACKED_CLIENTS:
+                self._forget_idle(now)
+            bucket = self._buckets[host] = TokenBucket(self.rate, self.burst)
+
+        if bucket.take(now):
+            return True
+        self._reject("rate_limit", host, device)
+        return False
+
+    def _forget_idle(self, now: float) -> None:
+        """Drop the buckets of clients that have refilled completely.
+
+        Such clients are treated exactly like new ones, so their buckets can
+        be recreated on demand.
+        """
+        self._buckets = {
+            host: bucket
+            for host, bucket in self._buckets.items()
+            if bucket.refill(now) < bucket.burst
+        }
+
+    def _reject(self, reason: str, host: str, device: str | None) -> None:
+        """Count and log a rejected connection or request.
+
+        A client's first rejection is logged as a warning, then at most one
+        per `REJECTION_WARNING_INTERVAL` with the number of rejections since,
+        so that a flood of rejections doesn't flood the log too; the others
+        are logged at debug level.
+        """
+        metrics.rejected_total.inc(reason)
+        target = device or "shared port"
+
+        now = time.monotonic()
+        warned = self._warned.get(host)
+        if warned is not None and now - warned[0] < REJECTION_WARNING_INTERVAL:
+            self._warned[host] = (warned[0], warned[1] + 1)
+            http_logger.debug("Rejected %s for %s: %s", host, target, reason)
+            return
+
+        # Worst case, clients are warned about again sooner than they would be
+        if warned is None and len(self._warned) >= MAX_TRACKED_CLIENTS:
+            self._warned.clear()
+        self._warned[host] = (now, 0)
+        http_logger.warning(
+            "Rejected %s for %s: %s (%s more since the last warning)",
+            host,
+            target,
+            reason,
+            warned[1] if warned is not None else 0,
+        )
@@ -0,0 +1,148 @@
+"""announcer.py :: Periodically announce devices with SSDP `NOTIFY`.
+
+Controllers cache what they learn from searches for `CACHE-CONTROL: max-age`
+seconds. Multicasting `ssdp:alive` for each device at random intervals of
+between a quarter and a half of that keeps their caches fresh without them
+having to search, and `ssdp:byebye` on shutdown lets them drop the devices
+straight away. Devices are due at independent, jittered times, which are
+kept in a heap served by a single timer handle.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import random
+import typing as t
+
+from fauxmo import ssdp_logger
+from fauxmo.responses import MAX_AGE, SSDP_GROUP, SSDP_PORT
+
+Address = t.Tuple[str, int]
+
+
+class Announcer:
+    """Send each device's `ssdp:alive` messages on a jittered schedule."""
+
+    def __init__(
+        self,
+        send: t.Callable[[bytes, Address], None],
+        max_age: float = MAX_AGE,
+        initial_delay: float = 3.0,
+    ) -> None:
+        """Initialize an Announcer.
+
+        Args:
+            send: Sends a datagram to an address
+            max_age: `CACHE-CONTROL: max-age` advertised for the devices
+            initial_delay: Devices are first announced at random within this
+                           many seconds of `start`
+
+        """
+        self.send = send
+        self.max_age = max_age
+        self.initial_delay = initial_delay
+        self.address: Address = (SSDP_GROUP, SSDP_PORT)
+        self.alive: t.List[t.List[bytes]] = []
+        self.byebye: t.List[t.List[bytes]] = []
+        self.senders: t.List[t.Callable[[bytes, Address], None]] = []
+        self.addresses: t.List[Address] = []
+        self.started = False
+        self._queue: t.List[t.Tuple[float, int]] = []
+        self._handle: asyncio.TimerHandle | None = None
+
+    def add_device(
+        self,
+        alive: t.List[bytes],
+        byebye: t.List[bytes],
+        send: t.Callable[[bytes, Address], None] | None = None,
+        address: Address | None = None,
+    ) -> None:
+        """Add a device's rendered `ssdp:alive` and `ssdp:byebye` messages.
+
+        Devices added after `start` are announced within `initial_delay`.
+
+        Args:
+            alive: Messages announcing the device
+            byebye: Messages retiring the device
+            send: Sends the device's messages, if not the default `send`,
+                  e.g. from a particular interface
+            address: Multicast group and port to send them to, if not the
+                     IPv4 SSDP group
+
+        """
+        self.alive.append(alive)
+        self.byebye.append(byebye)
+        self.senders.append(send or self.send)
+        self.addresses.append(address or self.address)
+        if self.started:
+            self._push(len(self.alive) - 1, self._initial())
+
+    def interval(self) -> float:
+        """Return a random delay until a device's next announcement."""
+        return random.uniform(self.max_age / 4, self.max_age / 2)
+
+    def _initial(self) -> float:
+        """Return a random delay for a device's first announcement."""
+        return random.uniform(0, self.initial_delay)
+
+    def start(self) -> None:
+        """Schedule the first announcement of every device."""
+        self.started = True
+        for idx in range(len(self.alive)):
+            self._push(idx, self._initial())
+
+    def _push(self, idx: int, delay: float) -> None:
+        """Schedule the next announcement of a device."""
+        loop = asyncio.get_running_loop()
+        when = loop.time() + delay
+        heapq.heappush(self._queue, (when, idx))
+        if self._handle is None or when < self._handle.when():
+            self._schedule_run()
+
+    def _schedule_run(self) -> None:
+        """(Re)schedule the timer for the earliest announcement."""
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        if self._queue:
+            loop = asyncio.get_running_loop()
+            self._handle = loop.call_at(self._queue[0][0], self._run)
+
+    def _run(self) -> None:
+        """Announce the devices that are due and reschedule them."""
+        self._handle = None
+        queue = self._queue
+        now = asyncio.get_running_loop().time()
+        while queue and queue[0][0] <= now:
+            _, idx = heapq.heappop(queue)
+            send, address = self.senders[idx], self.addresses[idx]
+            for message in self.alive[idx]:
+                send(message, address)
+            heapq.heappush(queue, (now + self.interval(), idx))
+        self._schedule_run()
+
+    def stop(self, byebye: bool = True) -> None:
+        """Stop announcing, and send `ssdp:byebye` for every device.
+
+        Args:
+            byebye: Whether to send `ssdp:byebye`, which is only sent if the
+                    devices have been announced
+
+        """
+        was_started, self.started = self.started, False
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        self._queue.clear()
+        if not (byebye and was_started):
+            return
+
+        ssdp_logger.debug(
+            "Sending ssdp:byebye for %s devices", len(self.byebye)
+        )
+        for messages, send, address in zip(
+            self.byebye, self.senders, self.addresses
+        ):
+            for message in messages:
+                send(message, address)
@@ -7,7 +7,7 @@ import argparse
 import sys
 
 from fauxmo import __version__, logger
-from fauxmo.fauxmo import main
+from fauxmo.fauxmo import load_config, main
 
 try:
     import uvloop
@@ -32,6 +32,13 @@ def cli() -> None:
         default=0,
     )
     parser.add_argument("-c", "--config", help="specify alternate config file")
+    parser.add_argument(
+        "-w",
+        "--workers",
+        help="serve devices from this many processes (default 1)",
+        type=int,
+        default=1,
+    )
     parser.add_argument(
         "-V", "--version", action="version", version=__version__
     )
@@ -42,6 +49,24 @@ def cli() -> None:
     verbosity = max(40 - 10 * args.verbose, 10)
     logger.setLevel(verbosity)
 
+    if args.workers > 1:
+        # Only needed with `--workers`, so not imported on every start
+        from fauxmo.supervisor import Supervisor
+
+        # Fail here rather than in every worker if the config is unusable
+        config = load_config(args.config, args.workers)
+        supervisor = Supervisor(
+            lambda worker: main(
+                config_path_str=args.config,
+                verbosity=verbosity,
+                worker=worker,
+                workers=args.workers,
+                config=config,
+            ),
+            args.workers,
+        )
+        sys.exit(supervisor.run())
+
     main(config_path_str=args.config, verbosity=verbosity)
 
 
@@ -8,43 +8,121 @@ from __future__ import annotations
 
 import asyncio
 import importlib
+import itertools
 import json
 import logging
 import pathlib
 import signal
+import socket
 import sys
+import typing as t
 from functools import partial
 
-from fauxmo import __version__, logger
-from fauxmo.plugins import FauxmoPlugin
-from fauxmo.protocols import Fauxmo, SSDPServer
+from fauxmo import __version__, LOG_CATEGORIES, logger
+from fauxmo.plugins import AsyncFauxmoPlugin, BaseFauxmoPlugin, FauxmoPlugin
+from fauxmo.protocols import Fauxmo, FauxmoMultiplexer, SSDPServer
+from fauxmo.reaper import ConnectionReaper
+from fauxmo.responses import (
+    DeviceResponses,
+    SSDP_GROUP_V6,
+    SSDP_GROUP_V6_SITE,
+)
+from fauxmo.runner import PluginRunner
 from fauxmo.utils import (
+    attach_search_filter,
     get_local_ip,
-    get_unused_port,
+    get_local_ip6,
+    make_serial,
+    make_udp6_sock,
     make_udp_sock,
     module_from_file,
+    select_interfaces,
     validate_config,
 )
 
+# Ports tried by `start_server` for a server bound to port 0 on several hosts
+PORT_ATTEMPTS = 5
 
-def main(config_path_str: str | None = None, verbosity: int = 20) -> None:
-    """Run the main fauxmo process.
 
-    Spawns a UDP server to handle the Echo's UPnP / SSDP device discovery
-    process as well as multiple TCP servers to respond to the Echo's device
-    setup requests and handle its process for turning devices on and off.
+async def start_server(
+    protocol_factory: t.Callable[[], asyncio.Protocol],
+    hosts: t.Sequence[str],
+    port: int,
+    backlog: int = 100,
+) -> t.Tuple[t.List[asyncio.Server], int]:
+    """Start a TCP server listening on the same port on every host.
+
+    Binding to port 0 directly, rather than probing for a free port first,
+    leaves no window for the port to be taken before the server binds it on
+    the first host. The port it gets may already be taken on the other
+    hosts, though, in which case another is tried, up to `PORT_ATTEMPTS`
+    times.
+
+    Args:
+        protocol_factory: Creates the protocol for each connection
+        hosts: Addresses to listen on
+        port: Port to listen on, or 0 for any free port
+        backlog: Length of the queue of connections waiting to be accepted
+
+    Returns:
+        The servers started, and the port they are listening on
+
+    """
+    loop = asyncio.get_running_loop()
+    attempts = PORT_ATTEMPTS if port == 0 else 1
+    while True:
+        attempts -= 1
+        server = await loop.create_server(
+            protocol_factory, host=hosts[0], port=port, backlog=backlog
+        )
+        servers = [server]
+
+        # The same port on the remaining hosts, which a port of 0 wouldn't
+        # give
+        bound_port = server.sockets[0].getsockname()[1]
+        if len(hosts) > 1:
+            try:
+                servers.append(
+                    await loop.create_server(
+                        protocol_factory,
+                        host=hosts[1:],
+                        port=bound_port,
+                        backlog=backlog,
+                    )
+                )
+            except OSError:
+                server.close()
+                await server.wait_closed()
+                if not attempts:
+                    raise
+                logger.debug(
+                    "Port %s unavailable on %s, trying another",
+                    bound_port,
+                    hosts[1:],
+                )
+                continue
+        return servers, bound_port
+
+
+def load_config(
+    config_path_str: str | None = None, workers: int = 1
+) -> t.Dict[str, t.Any]:
+    """Find, read and check the config.
 
     Args:
         config_path_str: Path to config file. If not given will search for
                          `config.json` in cwd, `~/.fauxmo/`, and
                          `/etc/fauxmo/`.
-        verbosity: Logging verbosity, defaults to 20
+        workers: Number of worker processes the config will be served with
 
-    """
-    logger.setLevel(verbosity)
-    logger.info(f"Fauxmo {__version__}")
-    logger.debug(sys.version)
+    Returns:
+        The parsed config
+
+    Raises:
+        FileNotFoundError: If no config file is found
+        ValueError: If the config can't be served by `workers` workers
 
+    """
     config_path = None
     if config_path_str:
         config_path = pathlib.Path(config_path_str)
@@ -57,7 +135,7 @@ def main(config_path_str: str | None = None, verbosity: int = 20) -> None:
         ]:
             config_path = pathlib.Path(config_dir).expanduser() / "config.json"
             if config_path.is_file():
-                logger.info(f"Using config: {config_path}")
+                logger.info("Using config: %s", config_path)
                 break
 
     try:
@@ -71,23 +149,7 @@ def main(config_path_str: str | None = None, verbosity: int = 20) -> None:
         )
         raise
 
-    # Every config should include a FAUXMO section
-    fauxmo_config = config.get("FAUXMO")
-    fauxmo_ip = get_local_ip(fauxmo_config.get("ip_address"))
-
-    ssdp_server = SSDPServer()
-    pluginservers = []
-
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-
-    if verbosity < 20:
-        loop.set_debug(True)
-        logging.getLogger("asyncio").setLevel(logging.DEBUG)
-
-    try:
-        plugins = config["PLUGINS"]
-    except KeyError:
+    if "PLUGINS" not in config:
         # Give a meaningful message without a nasty traceback if it looks like
         # user is running a pre-v0.4.0 config.
         errmsg = (
@@ -99,6 +161,156 @@ def main(config_path_str: str | None = None, verbosity: int = 20) -> None:
         print(errmsg)
         sys.exit(1)
 
+    shared_port = config.get("FAUXMO", {}).get("shared_port")
+    if workers > 1 and shared_port:
+        raise ValueError("`shared_port` must be 0 with several workers")
+    return config
+
+
+def main(
+    config_path_str: str | None = None,
+    verbosity: int = 20,
+    worker: int = 0,
+    workers: int = 1,
+    config: t.Dict[str, t.Any] | None = None,
+) -> None:
+    """Run the main fauxmo process.
+
+    Spawns a UDP server to handle the Echo's UPnP / SSDP device discovery
+    process as well as multiple TCP servers to respond to the Echo's device
+    setup requests and handle its process for turning devices on and off.
+
+    Args:
+        config_path_str: Path to config file. If not given will search for
+                         `config.json` in cwd, `~/.fauxmo/`, and
+                         `/etc/fauxmo/`.
+        verbosity: Logging verbosity, defaults to 20
+        worker: Index of this worker process, when run by the `Supervisor`
+        workers: Number of worker processes; each serves and advertises
+                 every `workers`th configured device, starting at `worker`
+        config: Config already read with `load_config`, if not to be read
+                from `config_path_str`
+
+    """
+    logger.setLevel(verbosity)
+    logger.info("Fauxmo %s", __version__)
+    logger.debug(sys.version)
+
+    if config is None:
+        config = load_config(config_path_str, workers)
+
+    # Every config should include a FAUXMO section
+    fauxmo_config = config.get("FAUXMO", {})
+
+    # Trace only the listed categories at debug level, e.g. `["ssdp"]`
+    debug_categories = fauxmo_config.get("debug_categories")
+    if debug_categories is not None:
+        unknown = set(debug_categories) - LOG_CATEGORIES.keys()
+        if unknown:
+            logger.warning("Unknown debug_categories: %s", sorted(unknown))
+        for category, category_logger in LOG_CATEGORIES.items():
+            if category in debug_categories:
+                category_logger.setLevel(logging.DEBUG)
+            else:
+                category_logger.setLevel(max(verbosity, logging.INFO))
+
+    # Serve on several interfaces if `interfaces` is set, answering each
+    # search with the address of the interface on the searcher's subnet
+    interface_names = fauxmo_config.get("interfaces")
+    interfaces = select_interfaces(interface_names) if interface_names else []
+    addresses = [interface.address for interface in interfaces]
+    if interfaces:
+        fauxmo_ip = addresses[0]
+        logger.info("Serving on interfaces: %s", interfaces)
+    else:
+        fauxmo_ip = get_local_ip(fauxmo_config.get("ip_address"))
+    fauxmo_hosts = list(addresses) or [fauxmo_ip]
+
+    # Also serve and answer searches over IPv6 if `ipv6_address` is set
+    fauxmo_ip6 = None
+    ipv6_address = fauxmo_config.get("ipv6_address")
+    if ipv6_address:
+        fauxmo_ip6 = get_local_ip6(ipv6_address)
+        fauxmo_hosts.append(fauxmo_ip6)
+        ipv6_groups = [SSDP_GROUP_V6]
+        if fauxmo_config.get("ssdp_ipv6_site_local"):
+            ipv6_groups.append(SSDP_GROUP_V6_SITE)
+        ipv6_interface = fauxmo_config.get("ipv6_interface")
+        ipv6_index = (
+            socket.if_nametoindex(ipv6_interface) if ipv6_interface else 0
+        )
+
+    keep_alive_timeout = None
+    if fauxmo_config.get("keep_alive") is True:
+        keep_alive_timeout = float(fauxmo_config.get("keep_alive_timeout", 10))
+    request_timeout = fauxmo_config.get("request_timeout", 10)
+    if request_timeout is not None:
+        request_timeout = float(request_timeout)
+    reaper = ConnectionReaper()
+
+    # All devices share a single listening socket if `shared_port` is set
+    shared_port = fauxmo_config.get("shared_port")
+    if shared_port is not None:
+        shared_port = int(shared_port)
+    shared_devices: t.Dict[
+        str, t.Tuple[BaseFauxmoPlugin, DeviceResponses]
+    ] = {}
+
+    # Protocol factories of the per-device servers, all started at once
+    device_factories: t.List[t.Tuple[BaseFauxmoPlugin, partial[Fauxmo]]] = []
+
+    runner = PluginRunner(
+        max_workers=fauxmo_config.get("plugin_workers"),
+        queue_depth=fauxmo_config.get("plugin_queue_depth"),
+        state_ttl=fauxmo_config.get("state_cache_ttl"),
+    )
+
+    limits = {
+        "max_connections": fauxmo_config.get("max_connections"),
+        "max_connections_per_device": fauxmo_config.get(
+            "max_connections_per_device"
+        ),
+        "rate": fauxmo_config.get("rate_limit"),
+        "burst": fauxmo_config.get("rate_limit_burst"),
+    }
+    admission = None
+    if any(limit is not None for limit in limits.values()):
+        # Only needed with limits, so not imported on every start
+        from fauxmo.admission import AdmissionController
+
+        admission = AdmissionController(**limits)
+    backlog = int(fauxmo_config.get("listen_backlog", 100))
+
+    ssdp_max_pending = fauxmo_config.get("ssdp_max_pending", 8192)
+    ssdp_notify = fauxmo_config.get("ssdp_notify", True)
+    ssdp_server = SSDPServer(
+        max_pending=ssdp_max_pending,
+        announce=ssdp_notify,
+        interfaces=interfaces,
+    )
+    ssdp_servers = [(ssdp_server, fauxmo_ip)]
+    if fauxmo_ip6 is not None:
+        ssdp6_server = SSDPServer(
+            max_pending=ssdp_max_pending,
+            announce=ssdp_notify,
+            groups=ipv6_groups,
+        )
+        ssdp_servers.append((ssdp6_server, fauxmo_ip6))
+    device_plugins: t.List[BaseFauxmoPlugin] = []
+    servers: t.List[asyncio.Server] = []
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+
+    if verbosity < 20:
+        loop.set_debug(True)
+        logging.getLogger("asyncio").setLevel(logging.DEBUG)
+
+    plugins = config["PLUGINS"]
+
+    if workers > 1:
+        logger.info("Worker %s of %s", worker, workers)
+    device_indices = itertools.count()
     for plugin in plugins:
         modname = f"{__package__}.plugins.{plugin.lower()}"
         try:
@@ -109,8 +321,11 @@ def main(config_path_str: str | None = None, verbosity: int = 20) -> None:
             module = module_from_file(modname, path_str)
 
         PluginClass = getattr(module, plugin)  # noqa
-        if not issubclass(PluginClass, FauxmoPlugin):
-            raise TypeError(f"Plugins must inherit from {repr(FauxmoPlugin)}")
+        if not issubclass(PluginClass, (FauxmoPlugin, AsyncFauxmoPlugin)):
+            raise TypeError(
+                f"Plugins must inherit from {repr(FauxmoPlugin)} or "
+                f"{repr(AsyncFauxmoPlugin)}"
+            )
 
         # Pass along variables defined at the plugin level that don't change
         # per device
@@ -119,37 +334,126 @@ def main(config_path_str: str | None = None, verbosity: int = 20) -> None:
             for k, v in config["PLUGINS"][plugin].items()
             if k not in {"DEVICES", "path"}
         }
-        logger.debug(f"plugin_vars: {repr(plugin_vars)}")
+        logger.debug("plugin_vars: %r", plugin_vars)
 
         for device in config["PLUGINS"][plugin]["DEVICES"]:
-            # Ensure port is `int`, set it if not given (`None`) or 0
-            device["port"] = int(device.get("port", 0)) or get_unused_port()
+            if next(device_indices) % workers != worker:
+                continue
+
+            # Ensure port is `int`; if not given (`None`) or 0, the port the
+            # server is bound to is set on the plugin once it has started
+            if shared_port is not None:
+                device["port"] = shared_port
+            else:
+                device["port"] = int(device.get("port") or 0)
 
-            logger.debug(f"device config: {repr(device)}")
+            logger.debug("device config: %r", device)
 
             validate_config(device)
 
             try:
                 plugin = PluginClass(**plugin_vars, **device)
             except TypeError:
-                logger.error(f"Error in plugin {repr(PluginClass)}")
+                logger.error("Error in plugin %r", PluginClass)
                 raise
 
-            fauxmo = partial(Fauxmo, name=plugin.name, plugin=plugin)
-            coro = loop.create_server(fauxmo, host=fauxmo_ip, port=plugin.port)
-            server = loop.run_until_complete(coro)
-            pluginservers.append((plugin, server))
+            device_plugins.append(plugin)
+
+            if shared_port is not None:
+                base_path = f"/{make_serial(plugin.name)}"
+                responses = DeviceResponses(plugin.name, base_path=base_path)
+                shared_devices[responses.serial] = (plugin, responses)
+                logger.debug("Added fauxmo device: %s", plugin.name)
+                continue
+
+            fauxmo = partial(
+                Fauxmo,
+                name=plugin.name,
+                plugin=plugin,
+                responses=DeviceResponses(plugin.name),
+                keep_alive_timeout=keep_alive_timeout,
+                runner=runner,
+                admission=admission,
+                request_timeout=request_timeout,
+                reaper=reaper,
+            )
+            device_factories.append((plugin, fauxmo))
+
+    started = loop.run_until_complete(
+        asyncio.gather(
+            *(
+                start_server(factory, fauxmo_hosts, plugin.port, backlog)
+                for plugin, factory in device_factories
+            )
+        )
+    )
+    for (plugin, factory), (device_servers, port) in zip(
+        device_factories, started
+    ):
+        servers += device_servers
+        plugin._port = port
+        for ssdp, ip_address in ssdp_servers:
+            ssdp.add_device(plugin.name, ip_address, port)
+        logger.debug("Started fauxmo device: %r", factory.keywords)
+
+    if shared_port is not None:
+        multiplexer = partial(
+            FauxmoMultiplexer,
+            devices=shared_devices,
+            keep_alive_timeout=keep_alive_timeout,
+            runner=runner,
+            admission=admission,
+            request_timeout=request_timeout,
+            reaper=reaper,
+        )
+        shared_servers, shared_port = loop.run_until_complete(
+            start_server(multiplexer, fauxmo_hosts, shared_port, backlog)
+        )
+        servers += shared_servers
+        for serial, (plugin, _) in shared_devices.items():
+            plugin._port = shared_port
+            for ssdp, ip_address in ssdp_servers:
+                ssdp.add_device(
+                    plugin.name,
+                    ip_address,
+                    shared_port,
+                    base_path=f"/{serial}",
+                )
+        logger.debug(
+            "Started %s fauxmo devices on %s", len(shared_devices), shared_port
+        )
+
+    logger.info("Starting UDP server")
+
+    ssdp_socks = [make_udp_sock(addresses)]
+    if fauxmo_ip6 is not None:
+        ssdp_socks.append(make_udp6_sock(ipv6_groups, ipv6_index))
 
-            ssdp_server.add_device(plugin.name, fauxmo_ip, plugin.port)
+    # Optionally have the kernel drop other devices' SSDP traffic
+    if fauxmo_config.get("ssdp_kernel_filter"):
+        for sock in ssdp_socks:
+            if attach_search_filter(sock):
+                logger.debug("Attached SSDP kernel filter to %s", sock)
 
-            logger.debug(f"Started fauxmo device: {repr(fauxmo.keywords)}")
+    for (ssdp, _), sock in zip(ssdp_servers, ssdp_socks):
+        listen = loop.create_datagram_endpoint(lambda: ssdp, sock=sock)
+        loop.run_until_complete(listen)
 
-    logger.info("Starting UDP server")
+    metrics_port = fauxmo_config.get("metrics_port")
+    if metrics_port is not None:
+        # Only needed with `metrics_port`, so not imported on every start
+        from fauxmo.metrics import MetricsServer
 
-    listen = loop.create_datagram_endpoint(
-        lambda: ssdp_server, sock=make_udp_sock()
-    )
-    transport, _ = loop.run_until_complete(listen)
+        metrics_host = fauxmo_config.get("metrics_host", "127.0.0.1")
+        coro = loop.create_server(
+            MetricsServer, host=metrics_host, port=int(metrics_port) + worker
+        )
+        servers.append(loop.run_until_complete(coro))
+        logger.info(
+            "Serving metrics on %s:%s",
+            metrics_host,
+            int(metrics_port) + worker,
+        )
 
     for signame in ("SIGINT", "SIGTERM"):
         try:
@@ -166,11 +470,15 @@ def main(config_path_str: str | None = None, verbosity: int = 20) -> None:
 
     # Will not reach this part unless SIGINT or SIGTERM triggers `loop.stop()`
     logger.debug("Shutdown starting...")
-    transport.close()
-    for idx, (plugin, server) in enumerate(pluginservers):
-        logger.debug(f"Shutting down server {idx}...")
+    for ssdp, _ in ssdp_servers:
+        ssdp.close()
+    for plugin in device_plugins:
         plugin.close()
+    for idx, server in enumerate(servers):
+        logger.debug("Shutting down server %s...", idx)
         server.close()
         loop.run_until_complete(server.wait_closed())
 
+    reaper.close()
+    runner.shutdown()
     loop.close()
@@ -0,0 +1,310 @@
+"""metrics.py :: Counters and latency histograms for Fauxmo.
+
+Metrics are kept in module-level instances that the protocols and plugin
+runner update directly; recording is a dictionary lookup and an increment, so
+it is cheap enough to do unconditionally on every request. If `metrics_port`
+is set in the `FAUXMO` config section, they are served in the Prometheus text
+exposition format at `/metrics`.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import typing as t
+from bisect import bisect_left
+from typing import cast
+
+from fauxmo import logger
+from fauxmo.parser import HTTPRequestParser, ParseError
+
+LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+def _format_labels(names: t.Sequence[str], values: t.Sequence[str]) -> str:
+    """Format label names and values as `{name="value",...}`."""
+    if not names:
+        return ""
+    pairs = ",".join(
+        f'{name}="{escape_label(str(value))}"'
+        for name, value in zip(names, values)
+    )
+    return f"{{{pairs}}}"
+
+
+def escape_label(value: str) -> str:
+    """Escape a label value for the Prometheus text format."""
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Metric:
+    """Base class for a metric family with a fixed set of label names."""
+
+    kind = "untyped"
+
+    def __init__(
+        self, name: str, documentation: str, labels: t.Sequence[str] = ()
+    ) -> None:
+        """Initialize and register a metric.
+
+        Args:
+            name: Metric name, e.g. "fauxmo_requests_total"
+            documentation: Help text
+            labels: Label names; values are passed positionally when
+                    recording, in the same order
+
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        REGISTRY.append(self)
+
+    def render(self) -> t.List[str]:
+        """Return the metric family in the Prometheus text format."""
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+            *self.samples(),
+        ]
+
+    def samples(self) -> t.List[str]:
+        """Return the sample lines of the metric family."""
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    """A monotonically increasing count, per combination of labels."""
+
+    kind = "counter"
+
+    def __init__(
+        self, name: str, documentation: str, labels: t.Sequence[str] = ()
+    ) -> None:
+        """Initialize a Counter; see `Metric`."""
+        super().__init__(name, documentation, labels)
+        self.values: t.Dict[t.Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        """Increment the counter for the given label values."""
+        values = self.values
+        values[labels] = values.get(labels, 0) + amount
+
+    def samples(self) -> t.List[str]:
+        """Return one sample per combination of labels."""
+        return [
+            f"{self.name}{_format_labels(self.labels, labels)} {value}"
+            for labels, value in self.values.items()
+        ]
+
+
+class Gauge(Counter):
+    """A value that can go up and down, per combination of labels."""
+
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        """Decrement the gauge for the given label values."""
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(Metric):
+    """Distribution of observed values, e.g. latencies, in fixed buckets."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: t.Sequence[str] = (),
+        buckets: t.Sequence[float] = LATENCY_BUCKETS,
+    ) -> None:
+        """Initialize a Histogram; see `Metric`.
+
+        Args:
+            name: See `Metric`
+            documentation: See `Metric`
+            labels: See `Metric`
+            buckets: Sorted upper bounds of the buckets, excluding `+Inf`
+
+        """
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+        # Per combination of labels: a (non-cumulative) count per bucket
+        # including `+Inf`, followed by the sum of the observed values
+        self.values: t.Dict[t.Tuple[str, ...], t.List[float]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        """Record an observed value for the given label values."""
+        series = self.values.get(labels)
+        if series is None:
+            series = self.values[labels] = [0] * (len(self.buckets) + 2)
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def samples(self) -> t.List[str]:
+        """Return the cumulative buckets, sum and count per label values."""
+        lines = []
+        bucket_labels = (*self.labels, "le")
+        bounds = [*(repr(bound) for bound in self.buckets), "+Inf"]
+        for labels, series in self.values.items():
+            cumulative = 0.0
+            for bound, count in zip(bounds, series):
+                cumulative += count
+                lines.append(
+                    f"{self.name}_bucket"
+                    f"{_format_labels(bucket_labels, (*labels, bound))} "
+                    f"{cumulative}"
+                )
+            formatted = _format_labels(self.labels, labels)
+            lines.append(f"{self.name}_sum{formatted} {series[-1]}")
+            lines.append(f"{self.name}_count{formatted} {cumulative}")
+        return lines
+
+
+REGISTRY: t.List[Metric] = []
+
+requests_total = Counter(
+    "fauxmo_requests_total",
+    "HTTP requests handled, by device and action.",
+    ("device", "action"),
+)
+request_errors_total = Counter(
+    "fauxmo_request_errors_total",
+    "HTTP requests that could not be completed, by device and action.",
+    ("device", "action"),
+)
+request_duration_seconds = Histogram(
+    "fauxmo_request_duration_seconds",
+    "Time from receiving a complete request to writing its response.",
+    ("device", "action"),
+)
+plugin_calls_total = Counter(
+    "fauxmo_plugin_calls_total",
+    "Plugin method calls, by plugin class and method.",
+    ("plugin", "method"),
+)
+plugin_errors_total = Counter(
+    "fauxmo_plugin_errors_total",
+    "Plugin method calls that raised, by plugin class and method.",
+    ("plugin", "method"),
+)
+plugin_call_duration_seconds = Histogram(
+    "fauxmo_plugin_call_duration_seconds",
+    "Duration of plugin method calls, by plugin class and method.",
+    ("plugin", "method"),
+)
+connections_total = Counter(
+    "fauxmo_connections_total", "TCP connections accepted by device servers."
+)
+connections_open = Gauge(
+    "fauxmo_connections_open", "TCP connections currently open."
+)
+rejected_total = Counter(
+    "fauxmo_rejected_total",
+    "Connections and requests rejected by admission control, by reason.",
+    ("reason",),
+)
+connections_reaped_total = Counter(
+    "fauxmo_connections_reaped_total",
+    "Connections closed for missing a deadline, by reason.",
+    ("reason",),
+)
+ssdp_datagrams_total = Counter(
+    "fauxmo_ssdp_datagrams_total", "Datagrams received by the SSDP server."
+)
+ssdp_searches_total = Counter(
+    "fauxmo_ssdp_searches_total",
+    "SSDP searches answered, by search target.",
+    ("st",),
+)
+ssdp_responses_total = Counter(
+    "fauxmo_ssdp_responses_total", "SSDP search responses sent."
+)
+ssdp_notifications_total = Counter(
+    "fauxmo_ssdp_notifications_total",
+    "SSDP NOTIFY messages (ssdp:alive and ssdp:byebye) sent.",
+)
+ssdp_responses_suppressed_total = Counter(
+    "fauxmo_ssdp_responses_suppressed_total",
+    "SSDP responses not sent as the search repeated one being answered.",
+)
+ssdp_responses_dropped_total = Counter(
+    "fauxmo_ssdp_responses_dropped_total",
+    "SSDP responses dropped as too many were already pending.",
+)
+
+
+def render() -> bytes:
+    """Return all registered metrics in the Prometheus text format."""
+    lines = [line for metric in REGISTRY for line in metric.render()]
+    return ("\n".join(lines) + "\n").encode()
+
+
+class MetricsServer(asyncio.Protocol):
+    """Minimal HTTP server exposing the metrics at `/metrics`."""
+
+    def __init__(self) -> None:
+        """Initialize a MetricsServer."""
+        self.transport: asyncio.Transport | None = None
+        self.parser = HTTPRequestParser()
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        """Accept an incoming TCP connection.
+
+        Args:
+            transport: Passed in asyncio.Transport
+
+        """
+        self.transport = cast(asyncio.Transport, transport)
+
+    def data_received(self, data: bytes) -> None:
+        """Respond to a scrape once a complete request has been received.
+
+        Args:
+            data: Incoming data, possibly only part of a request
+
+        """
+        if not self.transport:
+            raise Exception("No transport")
+
+        try:
+            requests = self.parser.feed(data)
+        except ParseError as e:
+            logger.warning("Unable to parse metrics request: %s", e)
+            self.transport.close()
+            return
+
+        if not requests:
+            return
+
+        if requests[0].path == "/metrics":
+            status = "200 OK"
+            body = render()
+        else:
+            status = "404 Not Found"
+            body = b""
+
+        headers = (
+            f"HTTP/1.1 {status}\r\n"
+            "Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Connection: close\r\n"
+            "\r\n"
+        )
+        self.transport.write(headers.encode() + body)
+        self.transport.close()
@@ -0,0 +1,216 @@
+"""parser.py :: Incremental parsing of the Echo's HTTP requests.
+
+The Echo's requests are small, but nothing guarantees that a request arrives
+in a single TCP segment, or that a segment holds only one request. Data is
+therefore buffered per connection until a complete request (headers plus
+`Content-Length` bytes of body) is available.
+
+SSDP searches, on the other hand, arrive whole in a single datagram, and are
+parsed straight from the datagram's bytes by `parse_search`.
+"""
+
+from __future__ import annotations
+
+import typing as t
+
+HEADER_END = b"\r\n\r\n"
+SEARCH_METHOD = b"M-SEARCH"
+
+
+class ParseError(ValueError):
+    """Raised when a request is malformed or exceeds the parser's limits."""
+
+
+class HTTPRequest:
+    """A complete HTTP request.
+
+    Header names are lower case; header values have surrounding whitespace
+    stripped.
+    """
+
+    __slots__ = ("method", "target", "path", "version", "headers", "body")
+
+    def __init__(
+        self,
+        method: str,
+        target: str,
+        version: str,
+        headers: t.Dict[str, str],
+        body: bytes = b"",
+    ) -> None:
+        """Initialize an HTTPRequest.
+
+        Args:
+            method: Request method, e.g. "GET"
+            target: Request target, e.g. "/setup.xml"
+            version: HTTP version, e.g. "HTTP/1.1"
+            headers: Mapping of lower case header names to values
+            body: Request body
+
+        """
+        self.method = method
+        self.target = target
+        self.path = target.partition("?")[0]
+        self.version = version
+        self.headers = headers
+        self.body = body
+
+    @property
+    def keep_alive(self) -> bool:
+        """Return whether the client wants the connection kept open."""
+        connection = self.headers.get("connection", "").lower()
+        if self.version == "HTTP/1.0":
+            return connection == "keep-alive"
+        return connection != "close"
+
+    def __repr__(self) -> str:
+        """Provide a human-readable representation of the request."""
+        return (
+            f"{self.__class__.__name__}({self.method} {self.target} "
+            f"{self.version}, headers={self.headers!r}, body={self.body!r})"
+        )
+
+
+class HTTPRequestParser:
+    """Buffer data for a single connection and yield complete requests."""
+
+    max_header_size = 8192
+    max_body_size = 65536
+
+    def __init__(self) -> None:
+        """Initialize an empty parser."""
+        self._buffer = bytearray()
+        self._pending: HTTPRequest | None = None
+        self._content_length = 0
+
+    @property
+    def pending(self) -> bool:
+        """Whether part of a request has been received but not completed."""
+        return bool(self._buffer) or self._pending is not None
+
+    def feed(self, data: bytes) -> t.List[HTTPRequest]:
+        """Add incoming data and return any requests it completes.
+
+        Args:
+            data: Bytes as received from the transport
+
+        Returns:
+            List of complete requests, in the order they were received; empty
+            if more data is needed
+
+        Raises:
+            ParseError: If the request cannot be parsed
+
+        """
+        buffer = self._buffer
+        buffer += data
+        requests = []
+
+        while True:
+            if self._pending is None:
+                end = buffer.find(HEADER_END)
+                if end == -1:
+                    if len(buffer) > self.max_header_size:
+                        raise ParseError("Request headers too large")
+                    break
+                if end > self.max_header_size:
+                    raise ParseError("Request headers too large")
+                self._pending = self._parse_head(bytes(buffer[:end]))
+                del buffer[: end + len(HEADER_END)]
+
+            if len(buffer) < self._content_length:
+                break
+
+            request = self._pending
+            request.body = bytes(buffer[: self._content_length])
+            del buffer[: self._content_length]
+            self._pending = None
+            requests.append(request)
+
+        return requests
+
+    def _parse_head(self, head: bytes) -> HTTPRequest:
+        """Parse the request line and headers in a single pass.
+
+        Args:
+            head: Everything before the blank line ending the headers
+
+        Returns:
+            Request without its body
+
+        """
+        request_line, *header_lines = head.decode("latin-1").split("\r\n")
+
+        try:
+            method, target, version = request_line.split(" ")
+        except ValueError:
+            raise ParseError(f"Invalid request line: {request_line!r}")
+
+        headers = {}
+        for line in header_lines:
+            name, sep, value = line.partition(":")
+            if not sep:
+                raise ParseError(f"Invalid header line: {line!r}")
+            headers[name.strip().lower()] = value.strip()
+
+        if "chunked" in headers.get("transfer-encoding", "").lower():
+            raise ParseError("Chunked requests are not supported")
+
+        content_length = headers.get("content-length", "0")
+        if not (content_length.isascii() and content_length.isdigit()):
+            raise ParseError(f"Invalid Content-Length: {content_length!r}")
+        self._content_length = int(content_length)
+        if self._content_length > self.max_body_size:
+            raise ParseError("Request body too large")
+
+        return HTTPRequest(method, target, version, headers)
+
+
+class SSDPSearch(t.NamedTuple):
+    """The parts of an SSDP `M-SEARCH` request that matter to Fauxmo."""
+
+    method: str
+    search_target: str
+    man: str
+    mx: float
+
+
+def parse_search(data: bytes) -> SSDPSearch | None:
+    """Parse an SSDP search datagram in a single pass over its lines.
+
+    Args:
+        data: Datagram as received, which should start with `M-SEARCH`
+
+    Returns:
+        The search, or `None` if the datagram isn't an `M-SEARCH` with an
+        `ST` header
+
+    """
+    if not data.startswith(SEARCH_METHOD):
+        return None
+
+    search_target = man = None
+    mx = 0.0
+    for line in data.splitlines()[1:]:
+        name, sep, value = line.partition(b":")
+        if not sep:
+            continue
+        name = name.strip().upper()
+        if name == b"ST":
+            search_target = value.strip()
+        elif name == b"MAN":
+            man = value.strip()
+        elif name == b"MX":
+            try:
+                mx = float(value)
+            except ValueError:
+                pass
+
+    if search_target is None:
+        return None
+    return SSDPSearch(
+        SEARCH_METHOD.decode(),
+        search_target.decode("latin-1"),
+        (man or b"").decode("latin-1"),
+        mx,
+    )
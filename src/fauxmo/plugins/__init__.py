@@ -1,4 +1,4 @@
-"""fauxmo.plugins :: Provide ABC for Fauxmo plugins."""
+"""fauxmo.plugins :: Provide ABCs for Fauxmo plugins."""
 
 from __future__ import annotations
 
@@ -6,18 +6,11 @@ import abc
 from typing import Callable
 
 
-class FauxmoPlugin(abc.ABC):
-    """Provide ABC for Fauxmo plugins.
-
-    This will become the `plugin` attribute of a `Fauxmo` instance. Its `on`
-    and `off` methods will be called when Alexa turns something `on` or `off`.
+class BaseFauxmoPlugin(abc.ABC):
+    """Provide the parts shared by all Fauxmo plugins.
 
-    All keys (other than the list of `DEVICES`) from the config will be passed
-    into FauxmoPlugin as kwargs at initialization, which should let users do
-    some interesting things. However, that means users employing custom config
-    keys will need to override `__init__` and either set the `name` and
-    "private" `_port` attributes manually or pass the appropriate args to
-    `super().__init__()`.
+    Plugins should inherit from `FauxmoPlugin`, or from `AsyncFauxmoPlugin` if
+    their methods are coroutines, rather than from this class directly.
     """
 
     def __init__(
@@ -34,14 +27,14 @@ class FauxmoPlugin(abc.ABC):
                   accurately report state on-the-fly, such as polling for state
                   updates (e.g. mqtt) or with `use_fake_state`
 
-        Note about `port`: if not given in config, it will be set to an
-        apparently free port in `fauxmo.fauxmo` before FauxmoPlugin
-        initialization. This attribute serves no default purpose in the
-        FauxmoPlugin but is passed in to be accessible by user code (i.e. for
-        logging / debugging). Alternatively, one could accept and throw away
-        the passed in `port` value and generate their own port in a plugin,
-        since the Fauxmo device determines its port from the plugin's instance
-        attribute.
+        Note about `port`: if not given in config, it is passed in as `0`,
+        and `fauxmo.fauxmo` sets `_port` to the free port the device's server
+        was bound to once it has started. This attribute serves no default
+        purpose in the FauxmoPlugin but is passed in to be accessible by user
+        code (i.e. for logging / debugging). Alternatively, one could accept
+        and throw away the passed in `port` value and generate their own port
+        in a plugin, since the Fauxmo device determines its port from the
+        plugin's instance attribute.
 
         The `_latest_action` attribute stores the most recent successful
         action, which is set by the `__getattribute__` hackery for successful
@@ -54,15 +47,6 @@ class FauxmoPlugin(abc.ABC):
         if initial_state in {"on", "off"}:
             self._latest_action = initial_state
 
-    def __getattribute__(self, name: str) -> Callable:
-        """Intercept `.on()` and `.off()` to set `_latest_action` attribute."""
-        if name in ["on", "off"]:
-            success = object.__getattribute__(self, name)()
-            if success is True:
-                self._latest_action = name
-            return lambda: success
-        return object.__getattribute__(self, name)
-
     @property
     def port(self) -> int:
         """Return port attribute in read-only manner."""
@@ -73,6 +57,48 @@ class FauxmoPlugin(abc.ABC):
         """Return name attribute in read-only manner."""
         return self._name
 
+    def close(self) -> None:
+        """Run when shutting down; allows plugin to clean up state."""
+
+    @property
+    def latest_action(self) -> str:
+        """Return latest action in read-only manner.
+
+        Must be a function instead of e.g. property because it overrides
+        `get_state`, and therefore must be callable.
+
+        """
+        return self._latest_action
+
+    def __repr__(self) -> str:
+        """Provide a default human-readable representation of the plugin."""
+        attrs = ", ".join(f"{k}={v!r}" for k, v in self.__dict__.items())
+        return f"{self.__class__.__name__}({attrs})"
+
+
+class FauxmoPlugin(BaseFauxmoPlugin):
+    """Provide ABC for Fauxmo plugins.
+
+    This will become the `plugin` attribute of a `Fauxmo` instance. Its `on`
+    and `off` methods will be called when Alexa turns something `on` or `off`.
+
+    All keys (other than the list of `DEVICES`) from the config will be passed
+    into FauxmoPlugin as kwargs at initialization, which should let users do
+    some interesting things. However, that means users employing custom config
+    keys will need to override `__init__` and either set the `name` and
+    "private" `_port` attributes manually or pass the appropriate args to
+    `super().__init__()`.
+    """
+
+    def __getattribute__(self, name: str) -> Callable:
+        """Intercept `.on()` and `.off()` to set `_latest_action` attribute."""
+        if name in ["on", "off"]:
+            success = object.__getattribute__(self, name)()
+            if success is True:
+                self._latest_action = name
+            return lambda: success
+        return object.__getattribute__(self, name)
+
     @abc.abstractmethod
     def on(self) -> bool:
         """Run function when Alexa turns this Fauxmo device on."""
@@ -97,20 +123,44 @@ class FauxmoPlugin(abc.ABC):
         """
         return self.latest_action
 
-    def close(self) -> None:
-        """Run when shutting down; allows plugin to clean up state."""
 
-    @property
-    def latest_action(self) -> str:
-        """Return latest action in read-only manner.
+class AsyncFauxmoPlugin(BaseFauxmoPlugin):
+    """Provide ABC for Fauxmo plugins whose methods are coroutines.
 
-        Must be a function instead of e.g. property because it overrides
-        `get_state`, and therefore must be callable.
+    Identical to `FauxmoPlugin`, except that `on`, `off` and `get_state` are
+    `async` methods, which the Fauxmo core awaits on the event loop instead of
+    running in a thread. Well suited to I/O-bound plugins (e.g. using
+    `asyncio.create_subprocess_exec` or an async HTTP library) that may need to
+    serve many concurrent requests. These methods must not block.
+    """
 
-        """
-        return self._latest_action
+    def __getattribute__(self, name: str) -> Callable:
+        """Intercept `.on()` and `.off()` to set `_latest_action` attribute."""
+        if name in ["on", "off"]:
+            method = object.__getattribute__(self, name)
 
-    def __repr__(self) -> str:
-        """Provide a default human-readable representation of the plugin."""
-        attrs = ", ".join(f"{k}={v!r}" for k, v in self.__dict__.items())
-        return f"{self.__class__.__name__}({attrs})"
+            async def set_latest_action() -> bool:
+                success = await method()
+                if success is True:
+                    self._latest_action = name
+                return success
+
+            return set_latest_action
+        return object.__getattribute__(self, name)
+
+    @abc.abstractmethod
+    async def on(self) -> bool:
+        """Run coroutine when Alexa turns this Fauxmo device on."""
+
+    @abc.abstractmethod
+    async def off(self) -> bool:
+        """Run coroutine when Alexa turns this Fauxmo device off."""
+
+    @abc.abstractmethod
+    async def get_state(self) -> str:
+        """Run coroutine when Alexa requests device state.
+
+        See `FauxmoPlugin.get_state`; plugins unable to determine state can
+        `return await super().get_state()` to fall back on `latest_action`.
+        """
+        return self.latest_action
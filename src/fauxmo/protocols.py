@@ -3,37 +3,138 @@
 from __future__ import annotations
 
 import asyncio
+import heapq
 import random
+import re
+import socket
+import time
 import typing as t
-import uuid
-from email.utils import formatdate
+from collections import deque
+from functools import partial
 from typing import cast
 
-from fauxmo import logger
-from fauxmo.plugins import FauxmoPlugin
-from fauxmo.utils import make_serial
+from fauxmo import http_logger, metrics, plugin_logger, ssdp_logger
+from fauxmo.parser import (
+    HTTPRequest,
+    HTTPRequestParser,
+    parse_search,
+    ParseError,
+    SEARCH_METHOD,
+)
+from fauxmo.plugins import BaseFauxmoPlugin
+from fauxmo.reaper import ConnectionReaper
+from fauxmo.responses import (
+    device_uuid,
+    DeviceResponses,
+    notify_messages,
+    Response,
+    SEARCH_TARGETS,
+    SearchResponse,
+    SSDP_GROUP,
+    SSDP_PORT,
+    url_host,
+)
+from fauxmo.runner import PluginQueueFull, PluginRunner
+from fauxmo.scheduler import ResponseScheduler
+from fauxmo.utils import Interface, make_multicast_sock, make_serial
+
+# Only needed if configured, so imported where used
+if t.TYPE_CHECKING:
+    from fauxmo.admission import AdmissionController
+    from fauxmo.announcer import Announcer
+
+SOAPACTION_HEADER = re.compile(
+    r"urn:Belkin:service:basicevent:1#(\w+)", flags=re.IGNORECASE
+)
+SOAPACTION_BODY = re.compile(
+    rb'SOAPACTION:\s*"urn:Belkin:service:basicevent:1#(\w+)"',
+    flags=re.IGNORECASE,
+)
+BINARY_STATE = re.compile(rb"<BinaryState>([01])</BinaryState>")
+
+SOAPActionHandler = t.Callable[
+    ["Fauxmo", HTTPRequest], t.Awaitable[t.Optional[Response]]
+]
 
 
 class Fauxmo(asyncio.Protocol):
     """Mimics a WeMo switch on the network.
 
     Aysncio protocol intended for use with BaseEventLoop.create_server.
+
+    By default the connection is closed after every response. If
+    `keep_alive_timeout` is given, connections are kept open for further
+    (possibly pipelined) requests, and closed once idle for that many seconds.
+    Connections that don't deliver a complete request within
+    `request_timeout` are closed as well.
     """
 
     NEWLINE = "\r\n"
 
-    def __init__(self, name: str, plugin: FauxmoPlugin) -> None:
+    def __init__(
+        self,
+        name: str,
+        plugin: BaseFauxmoPlugin,
+        responses: DeviceResponses | None = None,
+        keep_alive_timeout: float | None = None,
+        runner: PluginRunner | None = None,
+        admission: AdmissionController | None = None,
+        request_timeout: float | None = 10.0,
+        reaper: ConnectionReaper | None = None,
+    ) -> None:
         """Initialize a Fauxmo device.
 
         Args:
             name: How you want to call the device, e.g. "bedroom light"
             plugin: Fauxmo plugin
+            responses: Pre-rendered responses for this device, shared between
+                       connections; rendered here if not given
+            keep_alive_timeout: Seconds to keep an idle connection open for
+                                further requests, or `None` to close the
+                                connection after each response
+            runner: Runs plugin methods off the event loop, shared between
+                    connections; plugin methods are called directly on the
+                    event loop if not given
+            admission: Connection and rate limits, shared between
+                       connections; no limits if not given
+            request_timeout: Seconds for a client to send a complete request
+                             once it connects or starts the request, or
+                             `None` to wait indefinitely
+            reaper: Enforces the timeouts, shared between connections
 
         """
         self.name = name
-        self.serial = make_serial(name)
         self.plugin = plugin
+        self.responses = responses or DeviceResponses(name)
+        self.serial = self.responses.serial
+        self.admission_key: str | None = name
+        self._init_connection(
+            keep_alive_timeout, runner, admission, request_timeout, reaper
+        )
+
+    def _init_connection(
+        self,
+        keep_alive_timeout: float | None,
+        runner: PluginRunner | None,
+        admission: AdmissionController | None,
+        request_timeout: float | None,
+        reaper: ConnectionReaper | None,
+    ) -> None:
+        """Initialize the per-connection state that isn't device specific."""
+        self.keep_alive_timeout = keep_alive_timeout
+        self.runner = runner or PluginRunner(max_workers=0)
+        self.admission = admission
+        self.request_timeout = request_timeout
+        self.reaper = reaper or ConnectionReaper()
+        self.admitted = False
+        self.peer_host = ""
+        self.keep_alive = False
         self.transport: asyncio.Transport | None = None
+        self.parser = HTTPRequestParser()
+        self._requests: t.Deque[t.Tuple[float, HTTPRequest]] = deque()
+        self._action: asyncio.Future | None = None
+        self._request_started = 0.0
+        self._request_action = ""
 
     def connection_made(self, transport: asyncio.BaseTransport) -> None:
         """Accept an incoming TCP connection.
@@ -43,249 +144,384 @@ class Fauxmo(asyncio.Protocol):
 
         """
         peername = transport.get_extra_info("peername")
-        logger.debug(f"Connection made with: {peername}")
+        http_logger.debug("Connection made with: %s", peername)
         self.transport = cast(asyncio.Transport, transport)
+        metrics.connections_total.inc()
+        metrics.connections_open.inc()
+
+        if peername:
+            self.peer_host = peername[0]
+        if self.admission is not None:
+            self.admitted = self.admission.admit(
+                self.admission_key, self.peer_host
+            )
+            if not self.admitted:
+                self.transport.abort()
+                return
+        self._update_deadline()
+
+    def connection_lost(self, exc: Exception | None) -> None:
+        """Clean up when the connection is closed.
+
+        Args:
+            exc: Exception type, or `None` on a regular EOF or close
+
+        """
+        metrics.connections_open.dec()
+        if self.admitted:
+            self.admitted = False
+            cast("AdmissionController", self.admission).release(
+                self.admission_key
+            )
+        self.reaper.cancel(self)
 
     def data_received(self, data: bytes) -> None:
-        """Decode incoming data.
+        """Buffer incoming data and handle any complete requests.
+
+        Args:
+            data: Incoming data, possibly only part of a request
+
+        """
+        http_logger.debug("Received data:\n%r", data)
+
+        if not self.transport:
+            raise Exception("No transport")
+
+        received = time.perf_counter()
+
+        try:
+            requests = self.parser.feed(data)
+        except ParseError as e:
+            http_logger.warning("Unable to parse request: %s", e)
+            self.transport.close()
+            return
+
+        self._requests.extend((received, request) for request in requests)
+        self._process_requests()
+
+    def _process_requests(self) -> None:
+        """Handle queued requests in order.
+
+        Stops while a plugin action is in progress, so that responses to
+        pipelined requests are written in the order the requests arrived;
+        resumed once the action completes.
+        """
+        while self._requests and self._action is None:
+            if not self.transport or self.transport.is_closing():
+                self._requests.clear()
+                break
+            self._request_started, request = self._requests.popleft()
+            if self.admission is not None and not (
+                self.admission.allow_request(
+                    self.admission_key, self.peer_host
+                )
+            ):
+                self._requests.clear()
+                self.transport.close()
+                break
+            self.handle_request(request)
+
+        self._update_deadline()
+
+    def handle_request(self, request: HTTPRequest) -> None:
+        """Dispatch a complete request to the appropriate handler.
 
         Args:
-            data: Incoming message, either setup request or action request
+            request: Parsed HTTP request
 
         """
-        msg = data.decode()
+        http_logger.debug("Received request:\n%s", request)
 
-        logger.debug(f"Received message:\n{msg}")
-        if msg.startswith("GET /setup.xml HTTP/1.1"):
-            logger.info("setup.xml requested by Echo")
+        if not self.transport:
+            raise Exception("No transport")
+
+        self.keep_alive = (
+            self.keep_alive_timeout is not None and request.keep_alive
+        )
+
+        path = request.path
+        self._request_action = path.rpartition("/")[2]
+        if request.method == "GET" and path == "/setup.xml":
+            http_logger.info("setup.xml requested by Echo")
             self.handle_setup()
-        elif "/eventservice.xml" in msg:
-            logger.info("eventservice.xml request by Echo")
+        elif path == "/eventservice.xml":
+            http_logger.info("eventservice.xml request by Echo")
             self.handle_event()
-        elif "/metainfoservice.xml" in msg:
-            logger.info("metainfoservice.xml request by Echo")
+        elif path == "/metainfoservice.xml":
+            http_logger.info("metainfoservice.xml request by Echo")
             self.handle_metainfo()
-        elif msg.startswith("POST /upnp/control/basicevent1 HTTP/1.1"):
-            logger.info("request BasicEvent1")
-            self.handle_action(msg)
+        elif request.method == "POST" and path == "/upnp/control/basicevent1":
+            http_logger.info("request BasicEvent1")
+            self._action = asyncio.ensure_future(self.handle_action(request))
+            self._action.add_done_callback(self._action_done)
+        else:
+            http_logger.warning("Unrecognized request: %s", request)
+            self._request_action = "unknown"
+            self._record_request(success=False)
+            self.transport.close()
 
     def handle_setup(self) -> None:
         """Create a response to the Echo's setup request."""
-        setup_xml = (
-            '<?xml version="1.0"?>'
-            "<root>"
-            "<specVersion><major>1</major><minor>0</minor></specVersion>"
-            "<device>"
-            "<deviceType>urn:Belkin:device:controllee:1</deviceType>"
-            f"<friendlyName>{self.name}</friendlyName>"
-            "<manufacturer>Belkin International Inc.</manufacturer>"
-            "<modelName>Emulated Socket</modelName>"
-            "<modelNumber>3.1415</modelNumber>"
-            f"<serialNumber>{self.serial}</serialNumber>"
-            f"<UDN>uuid:Socket-1_0-{self.serial}</UDN>"
-            "<serviceList>"
-            "<service>"
-            "<serviceType>urn:Belkin:service:basicevent:1</serviceType>"
-            "<serviceId>urn:Belkin:serviceId:basicevent1</serviceId>"
-            "<controlURL>/upnp/control/basicevent1</controlURL>"
-            "<eventSubURL>/upnp/event/basicevent1</eventSubURL>"
-            "<SCPDURL>/eventservice.xml</SCPDURL>"
-            "</service>"
-            "<service>"
-            "<serviceType>urn:Belkin:service:metainfo:1</serviceType>"
-            "<serviceId>urn:Belkin:serviceId:metainfo1</serviceId>"
-            "<controlURL>/upnp/control/metainfo1</controlURL>"
-            "<eventSubURL>/upnp/event/metainfo1</eventSubURL>"
-            "<SCPDURL>/metainfoservice.xml</SCPDURL>"
-            "</service>"
-            "</serviceList>"
-            "</device>"
-            "</root>"
-        )
+        self.send_response(self.responses.setup)
 
-        setup_response = self.add_http_headers(setup_xml)
-        logger.debug(f"Fauxmo response to setup request:\n{setup_response}")
+    def _action_done(self, action: asyncio.Future) -> None:
+        """Clean up after an action and resume handling queued requests.
 
-        if not self.transport:
-            raise Exception("No transport")
+        Args:
+            action: The completed `handle_action` task
 
-        self.transport.write(setup_response.encode())
-        self.transport.close()
+        """
+        self._action = None
+        if not action.cancelled() and action.exception() is not None:
+            plugin_logger.error(
+                "Error handling action for %s",
+                self.plugin.name,
+                exc_info=action.exception(),
+            )
+            self._record_request(success=False)
+            if self.transport:
+                self.transport.close()
+        self._process_requests()
 
-    def handle_action(self, msg: str) -> None:
+    async def handle_action(self, request: HTTPRequest) -> None:
         """Execute `on`, `off`, or `get_state` method of plugin.
 
+        The SOAP action is looked up in `soap_actions`, and its handler
+        returns the response to send.
+
         Args:
-            msg: Body of the Echo's HTTP request to trigger an action
+            request: The Echo's HTTP request to trigger an action
 
         """
-        logger.debug(f"Handling action for plugin type {self.plugin}")
+        plugin_logger.debug("Handling action for plugin type %s", self.plugin)
 
         if not self.transport:
             raise Exception("No transport")
 
-        soap_format = (
-            "<s:Envelope "
-            'xmlns:s="http://schemas.xmlsoap.org/soap/envelope/" '
-            's:encodingStyle="http://schemas.xmlsoap.org/soap/encoding/">'
-            "<s:Body>"
-            "<u:{action}{action_type}Response "
-            'xmlns:u="urn:Belkin:service:basicevent:1">'
-            "<{action_type}>{return_val}</{action_type}>"
-            "</u:{action}{action_type}Response>"
-            "</s:Body>"
-            "</s:Envelope>"
-        ).format
-
-        command_format = (
-            'SOAPACTION: "urn:Belkin:service:basicevent:1#{}"'
-        ).format
-
-        soap_message: str | None = None
-        action: str | None = None
-        action_type: str | None = None
-        return_val: str | None = None
-        success: bool = False
-
-        if command_format("GetBinaryState").casefold() in msg.casefold():
-            logger.info(f"Attempting to get state for {self.plugin.name}")
-
-            action = "Get"
-            action_type = "BinaryState"
-
-            state = self.plugin.get_state().casefold()
-            logger.info(f"{self.plugin.name} state: {state}")
-
-            if state in ["off", "on"]:
-                success = True
-                return_val = str(int(state.lower() == "on"))
-
-        elif command_format("SetBinaryState").casefold() in msg.casefold():
-            action = "Set"
-            action_type = "BinaryState"
-
-            if "<BinaryState>0</BinaryState>" in msg:
-                logger.info(f"Attempting to turn off {self.plugin.name}")
-                return_val = "0"
-                success = self.plugin.off()
-
-            elif "<BinaryState>1</BinaryState>" in msg:
-                logger.info(f"Attempting to turn on {self.plugin.name}")
-                return_val = "1"
-                success = self.plugin.on()
-
-            else:
-                logger.warning(f"Unrecognized request:\n{msg}")
-
-        elif command_format("GetFriendlyName").casefold() in msg.casefold():
-            action = "Get"
-            action_type = "FriendlyName"
-            return_val = self.plugin.name
-            success = True
-            logger.info(f"{self.plugin.name} returning friendly name")
+        action = self.parse_soapaction(request)
+        handler = self.soap_actions.get(action) if action else None
+        # Only known actions become metric labels, as clients choose `action`
+        self._request_action = action if action and handler else "unknown"
 
-        if success:
-            soap_message = soap_format(
-                action=action, action_type=action_type, return_val=return_val
-            )
+        response = None
+        if handler is None:
+            http_logger.warning("Unrecognized SOAP action: %s", action)
+        else:
+            try:
+                response = await handler(self, request)
+            except PluginQueueFull as e:
+                plugin_logger.warning(e)
 
-            response = self.add_http_headers(soap_message)
-            logger.debug(response)
-            self.transport.write(response.encode())
+        if response is not None:
+            self.send_response(response)
         else:
-            errmsg = (
-                f"Unable to complete command for {self.plugin.name}:\n{msg}"
+            plugin_logger.warning(
+                "Unable to complete command for %s:\n%r",
+                self.plugin.name,
+                request.body,
             )
-            logger.warning(errmsg)
-        self.transport.close()
+            self._record_request(success=False)
+
+            # Closing without a response is how the Echo learns of a failure
+            self.transport.close()
+
+    @staticmethod
+    def parse_soapaction(request: HTTPRequest) -> str | None:
+        """Extract the casefolded action name from a SOAPACTION.
+
+        Some clients send the SOAPACTION inside the body rather than as a
+        header, so the body is checked if there is no header.
+
+        Args:
+            request: The Echo's HTTP request to trigger an action
+
+        Returns:
+            Action name, e.g. "getbinarystate", or `None` if not found
+
+        """
+        header = request.headers.get("soapaction")
+        if header is not None:
+            match = SOAPACTION_HEADER.search(header)
+            return match[1].casefold() if match else None
+
+        body_match = SOAPACTION_BODY.search(request.body)
+        return body_match[1].decode().casefold() if body_match else None
+
+    @classmethod
+    def register_action(
+        cls, action: str
+    ) -> t.Callable[[SOAPActionHandler], SOAPActionHandler]:
+        """Register a handler for a SOAP action, for use as a decorator.
+
+        The handler is an async function taking the protocol instance and the
+        request, and returning the response to send or `None` on failure.
+        Registering on a subclass leaves the actions of its parents unchanged.
+
+        Args:
+            action: SOAP action name, e.g. "GetBinaryState"
+
+        Returns:
+            Decorator registering the handler
+
+        """
+
+        def decorator(handler: SOAPActionHandler) -> SOAPActionHandler:
+            if "soap_actions" not in cls.__dict__:
+                cls.soap_actions = dict(cls.soap_actions)
+            cls.soap_actions[action.casefold()] = handler
+            return handler
+
+        return decorator
+
+    async def get_binary_state(self, request: HTTPRequest) -> Response | None:
+        """Respond to GetBinaryState with the plugin's state.
+
+        Args:
+            request: The Echo's HTTP request to trigger an action
+
+        Returns:
+            Response to send, or `None` if the state is unknown
+
+        """
+        plugin_logger.info("Attempting to get state for %s", self.plugin.name)
+
+        state = (await self.runner.get_state(self.plugin)).casefold()
+        plugin_logger.info("%s state: %s", self.plugin.name, state)
+
+        if state in ["off", "on"]:
+            return_val = str(int(state == "on"))
+            return self.responses.get_binary_state[return_val]
+        return None
+
+    async def set_binary_state(self, request: HTTPRequest) -> Response | None:
+        """Turn the plugin on or off as requested by SetBinaryState.
+
+        Args:
+            request: The Echo's HTTP request to trigger an action
+
+        Returns:
+            Response to send, or `None` if unsuccessful
+
+        """
+        match = BINARY_STATE.search(request.body)
+        if match is None:
+            http_logger.warning("Unrecognized request:\n%r", request.body)
+            return None
+
+        return_val = match[1].decode()
+        method = "on" if return_val == "1" else "off"
+        plugin_logger.info(
+            "Attempting to turn %s %s", method, self.plugin.name
+        )
+
+        if await self.runner.call(self.plugin, method):
+            return self.responses.set_binary_state[return_val]
+        return None
+
+    async def get_friendly_name(self, request: HTTPRequest) -> Response:
+        """Respond to GetFriendlyName with the device name.
+
+        Args:
+            request: The Echo's HTTP request to trigger an action
+
+        Returns:
+            Response to send
+
+        """
+        http_logger.info("%s returning friendly name", self.plugin.name)
+        return self.responses.friendly_name
+
+    soap_actions: t.Dict[str, SOAPActionHandler] = {
+        "getbinarystate": get_binary_state,
+        "setbinarystate": set_binary_state,
+        "getfriendlyname": get_friendly_name,
+    }
 
     def handle_metainfo(self) -> None:
         """Respond to request for metadata."""
-        if not self.transport:
-            raise Exception("No transport")
-
-        metainfo_xml = (
-            '<scpd xmlns="urn:Belkin:service-1-0">'
-            "<specVersion>"
-            "<major>1</major>"
-            "<minor>0</minor>"
-            "</specVersion>"
-            "<actionList>"
-            "<action>"
-            "<name>GetMetaInfo</name>"
-            "<argumentList>"
-            "<retval />"
-            "<name>GetMetaInfo</name>"
-            "<relatedStateVariable>MetaInfo</relatedStateVariable>"
-            "<direction>in</direction>"
-            "</argumentList>"
-            "</action>"
-            "</actionList>"
-            "<serviceStateTable>"
-            '<stateVariable sendEvents="yes">'
-            "<name>MetaInfo</name>"
-            "<dataType>string</dataType>"
-            "<defaultValue>0</defaultValue>"
-            "</stateVariable>"
-            "</serviceStateTable>"
-            "</scpd>"
-        ) + 2 * Fauxmo.NEWLINE
-
-        meta_response = self.add_http_headers(metainfo_xml)
-        logger.debug(f"Fauxmo response to setup request:\n{meta_response}")
-        self.transport.write(meta_response.encode())
-        self.transport.close()
+        self.send_response(self.responses.metainfo)
 
     def handle_event(self) -> None:
         """Respond to request for eventservice.xml."""
+        self.send_response(self.responses.eventservice)
+
+    def send_response(self, response: Response) -> None:
+        """Write a response, closing the connection unless kept alive.
+
+        Args:
+            response: Pre-rendered response to send
+
+        """
         if not self.transport:
             raise Exception("No transport")
 
-        eventservice_xml = (
-            '<scpd xmlns="urn:Belkin:service-1-0">'
-            "<actionList>"
-            "<action>"
-            "<name>SetBinaryState</name>"
-            "<argumentList>"
-            "<argument>"
-            "<retval/>"
-            "<name>BinaryState</name>"
-            "<relatedStateVariable>BinaryState</relatedStateVariable>"
-            "<direction>in</direction>"
-            "</argument>"
-            "</argumentList>"
-            "</action>"
-            "<action>"
-            "<name>GetBinaryState</name>"
-            "<argumentList>"
-            "<argument>"
-            "<retval/>"
-            "<name>BinaryState</name>"
-            "<relatedStateVariable>BinaryState</relatedStateVariable>"
-            "<direction>out</direction>"
-            "</argument>"
-            "</argumentList>"
-            "</action>"
-            "</actionList>"
-            "<serviceStateTable>"
-            '<stateVariable sendEvents="yes">'
-            "<name>BinaryState</name>"
-            "<dataType>Boolean</dataType>"
-            "<defaultValue>0</defaultValue>"
-            "</stateVariable>"
-            '<stateVariable sendEvents="yes">'
-            "<name>level</name>"
-            "<dataType>string</dataType>"
-            "<defaultValue>0</defaultValue>"
-            "</stateVariable>"
-            "</serviceStateTable>"
-            "</scpd>"
-        ) + 2 * Fauxmo.NEWLINE
-
-        event_response = self.add_http_headers(eventservice_xml)
-        logger.debug(f"Fauxmo response to setup request:\n{event_response}")
-        self.transport.write(event_response.encode())
-        self.transport.close()
+        if self.transport.is_closing():
+            http_logger.debug(
+                "Connection closed before response for %s", self.name
+            )
+            return
+
+        payload = response.render(keep_alive=self.keep_alive)
+        http_logger.debug("Fauxmo response:\n%r", payload)
+        self.transport.write(payload)
+        self._record_request(success=True)
+
+        if not self.keep_alive:
+            self.transport.close()
+
+    def _record_request(self, success: bool) -> None:
+        """Update the request metrics for the request being handled.
+
+        Args:
+            success: Whether a response was sent
+
+        """
+        labels = (self.name, self._request_action)
+        metrics.requests_total.inc(*labels)
+        if success:
+            duration = time.perf_counter() - self._request_started
+            metrics.request_duration_seconds.observe(duration, *labels)
+        else:
+            metrics.request_errors_total.inc(*labels)
+
+    def _update_deadline(self) -> None:
+        """Set the deadline for the current state of the connection.
+
+        A client has `request_timeout` from connecting, or from starting a
+        request on a kept-alive connection, to complete the request, however
+        steadily it trickles in. Between requests, a kept-alive connection is
+        closed after `keep_alive_timeout`. There is no deadline while
+        requests are being handled.
+        """
+        if (
+            self._action is not None
+            or self._requests
+            or not self.transport
+            or self.transport.is_closing()
+        ):
+            self.reaper.cancel(self)
+        elif self.parser.pending or not self.keep_alive:
+            if self.request_timeout is None:
+                self.reaper.cancel(self)
+            elif self.reaper.reason(self) != "request_timeout":
+                self.reaper.schedule(
+                    self, self.request_timeout, "request_timeout"
+                )
+        elif self.keep_alive_timeout is not None:
+            self.reaper.schedule(self, self.keep_alive_timeout, "idle")
+
+    def reap(self, reason: str) -> None:
+        """Close the connection once its deadline has passed.
+
+        Args:
+            reason: "request_timeout" or "idle"
+
+        """
+        http_logger.debug(
+            "Closing connection from %s: %s", self.peer_host, reason
+        )
+        if self.transport:
+            self.transport.close()
 
     @staticmethod
     def add_http_headers(xml: str) -> str:
@@ -295,47 +531,234 @@ class Fauxmo(asyncio.Protocol):
             xml: XML body that needs HTTP headers
 
         """
-        date_str = formatdate(timeval=None, localtime=False, usegmt=True)
-        return (Fauxmo.NEWLINE).join(
-            [
-                "HTTP/1.1 200 OK",
-                f'CONTENT-LENGTH: {len(xml.encode("utf8"))}',
-                "CONTENT-TYPE: text/xml",
-                f"DATE: {date_str}",
-                "LAST-MODIFIED: Sat, 01 Jan 2000 00:01:15 GMT",
-                "SERVER: Unspecified, UPnP/1.0, Unspecified",
-                "X-User-Agent: Fauxmo",
-                f"CONNECTION: close{Fauxmo.NEWLINE}",
-                f"{xml}",
-            ]
+        return Response(xml).render().decode("utf8")
+
+
+class FauxmoMultiplexer(Fauxmo):
+    """Serve many Fauxmo devices from a single listening socket.
+
+    Each device's endpoints are served under a path prefix of its serial, e.g.
+    `/<serial>/setup.xml`, and each request is routed to its device by that
+    prefix. Requests on a connection are handled one at a time, so the device
+    attributes of `Fauxmo` are simply swapped for the routed device.
+    """
+
+    def __init__(
+        self,
+        devices: t.Mapping[str, t.Tuple[BaseFauxmoPlugin, DeviceResponses]],
+        keep_alive_timeout: float | None = None,
+        runner: PluginRunner | None = None,
+        admission: AdmissionController | None = None,
+        request_timeout: float | None = 10.0,
+        reaper: ConnectionReaper | None = None,
+    ) -> None:
+        """Initialize a FauxmoMultiplexer.
+
+        Args:
+            devices: Mapping of device serial to the device's plugin and
+                     pre-rendered responses, which must have been rendered
+                     with a `base_path` of `/<serial>`
+            keep_alive_timeout: See `Fauxmo`
+            runner: See `Fauxmo`
+            admission: See `Fauxmo`; the per-device connection limit does
+                       not apply, as the device is only known per request
+            request_timeout: See `Fauxmo`
+            reaper: See `Fauxmo`
+
+        """
+        self.devices = devices
+        self.admission_key = None
+        self._init_connection(
+            keep_alive_timeout, runner, admission, request_timeout, reaper
         )
 
+    def handle_request(self, request: HTTPRequest) -> None:
+        """Route a complete request to its device, then dispatch it.
+
+        Args:
+            request: Parsed HTTP request
+
+        """
+        serial, _, path = request.path[1:].partition("/")
+        device = self.devices.get(serial)
+        if device is None:
+            http_logger.warning("Request for unknown device: %s", request)
+            metrics.requests_total.inc("unknown", "unknown")
+            metrics.request_errors_total.inc("unknown", "unknown")
+            if self.transport:
+                self.transport.close()
+            return
+
+        self.plugin, self.responses = device
+        self.name = self.plugin.name
+        self.serial = serial
+        request.path = f"/{path}"
+        super().handle_request(request)
+
 
 class SSDPServer(asyncio.DatagramProtocol):
     """UDP server that responds to the Echo's SSDP / UPnP requests."""
 
-    def __init__(self, devices: t.Iterable[dict] | None = None) -> None:
+    # Remember at most this many searches to ignore repeats of, and cache at
+    # most this many searchers' location hosts
+    max_recent_searches = 256
+
+    def __init__(
+        self,
+        devices: t.Iterable[dict] | None = None,
+        max_pending: int | None = 8192,
+        announce: bool = False,
+        interfaces: t.Sequence[Interface] = (),
+        groups: t.Sequence[str] = (SSDP_GROUP,),
+    ) -> None:
         """Initialize an SSDPServer instance.
 
         Args:
             devices: Iterable of devices to advertise when the Echo's SSDP
                      search request is received.
+            max_pending: Maximum number of responses waiting to be sent;
+                         further responses are dropped
+            announce: Whether to periodically multicast `ssdp:alive` for
+                      each device, and `ssdp:byebye` on `close`
+            interfaces: Interfaces the devices are served on, if several;
+                        searches are answered with the address of the one
+                        whose subnet the searching host is on, and devices
+                        are announced on each
+            groups: Multicast groups devices are announced to, e.g.
+                    `SSDP_GROUP_V6` for a server on an IPv6 socket
 
         """
-        self.devices = list(devices or ())
-
-    def add_device(self, name: str, ip_address: str, port: int) -> None:
-        """Keep track of a list of devices for logging and shutdown.
+        self.devices: t.List[dict] = []
+        self.scheduler = ResponseScheduler(self.send, max_pending=max_pending)
+        self.announce = announce
+        self.announcer: Announcer | None = None
+        if announce:
+            # Only needed with `ssdp_notify`, so not imported on every start
+            from fauxmo import announcer
+
+            self.announcer = announcer.Announcer(self.notify)
+        self.groups = list(groups)
+
+        self.interfaces = list(interfaces)
+        self._networks = [
+            (
+                int(interface.network.network_address),
+                int(interface.network.netmask),
+                interface.address.encode(),
+            )
+            for interface in self.interfaces
+        ]
+        self._location_hosts: t.Dict[str, t.Optional[bytes]] = {}
+        self._multicast_socks: t.Dict[str, socket.socket] = {}
+
+        # Until when a repeated search from the same address for the same
+        # target is ignored, as it is already being answered, and the same
+        # searches ordered by when they expire
+        self._recent_searches: t.Dict[
+            t.Tuple[t.Tuple[str, int], str], float
+        ] = {}
+        self._search_expiries: t.List[
+            t.Tuple[float, t.Tuple[t.Tuple[str, int], str]]
+        ] = []
+
+        # Rendered responses, per search target: of every device for the
+        # common search targets, and of a single device for its UUID
+        self.search_responses: t.Dict[str, t.List[SearchResponse]] = {
+            search_target: [] for search_target in SEARCH_TARGETS
+        }
+        for device in devices or ():
+            self.add_device(**device)
+
+    def add_device(
+        self, name: str, ip_address: str, port: int, base_path: str = ""
+    ) -> None:
+        """Add a device and render its responses to each search target.
 
         Args:
             name: Device name
             ip_address: IP address of device
             port: Port of device
+            base_path: Path prefix of the device's endpoints, for devices
+                       sharing a port
 
         """
-        device_dict = {"name": name, "ip_address": ip_address, "port": port}
+        device_dict = {
+            "name": name,
+            "ip_address": ip_address,
+            "port": port,
+            "base_path": base_path,
+        }
         self.devices.append(device_dict)
 
+        path = f":{port}{base_path}/setup.xml"
+        location = f"http://{url_host(ip_address)}{path}"
+        serial = make_serial(name)
+        for search_target in SEARCH_TARGETS:
+            self.search_responses[search_target].append(
+                SearchResponse(
+                    ip_address, port, serial, search_target, base_path
+                )
+            )
+
+        search_target = device_uuid(serial)
+        self.search_responses[search_target] = [
+            SearchResponse(ip_address, port, serial, search_target, base_path)
+        ]
+
+        if self.announcer is None:
+            return
+        senders: t.List[t.Tuple[str, t.Optional[t.Callable]]] = [
+            (
+                f"http://{interface.address}{path}",
+                partial(self.notify, interface=interface.address),
+            )
+            for interface in self.interfaces
+        ] or [(location, None)]
+        for location, send in senders:
+            for group in self.groups:
+                self.announcer.add_device(
+                    notify_messages(location, serial, True, group),
+                    notify_messages(location, serial, False, group),
+                    send,
+                    (group, SSDP_PORT),
+                )
+
+    def location_host(self, ip_address: str) -> bytes | None:
+        """Find the address of the interface on the same subnet as a host.
+
+        Args:
+            ip_address: Address of the host, e.g. of a search's sender
+
+        Returns:
+            Address of the first matching interface in `interfaces`, or
+            `None` if none matches
+
+        """
+        try:
+            return self._location_hosts[ip_address]
+        except KeyError:
+            pass
+
+        host = None
+        try:
+            packed = int.from_bytes(socket.inet_aton(ip_address), "big")
+        except OSError:
+            packed = None
+        if packed is not None:
+            host = next(
+                (
+                    address
+                    for network, netmask, address in self._networks
+                    if packed & netmask == network
+                ),
+                None,
+            )
+
+        if len(self._location_hosts) >= self.max_recent_searches:
+            self._location_hosts.clear()
+        self._location_hosts[ip_address] = host
+        return host
+
     def connection_made(self, transport: asyncio.BaseTransport) -> None:
         """Set transport attribute to incoming transport.
 
@@ -344,6 +767,8 @@ class SSDPServer(asyncio.DatagramProtocol):
 
         """
         self.transport = cast(asyncio.DatagramTransport, transport)
+        if self.announcer is not None:
+            self.announcer.start()
 
     def datagram_received(
         self, data: t.Union[bytes, t.Text], addr: t.Tuple[str, int]
@@ -355,88 +780,135 @@ class SSDPServer(asyncio.DatagramProtocol):
             addr: Address sending data
 
         """
-        if isinstance(data, bytes):
-            data = data.decode("utf8")
+        metrics.ssdp_datagrams_total.inc()
+        if isinstance(data, str):
+            data = data.encode("utf8")
 
-        logger.debug(f"Received data below from {addr}:")
-        logger.debug(data)
-
-        discover_patterns = [
-            "ST: urn:Belkin:device:**",
-            "ST: urn:Belkin:service:basicevent:1",
-            "ST: upnp:rootdevice",
-            "ST: ssdp:all",
-        ]
+        # Most of the traffic on port 1900 is other devices' `NOTIFY`s and
+        # responses, so drop anything but a search before doing any work
+        if not data.startswith(SEARCH_METHOD):
+            return
 
-        discover_pattern = next(
-            (pattern for pattern in discover_patterns if pattern in data), None
-        )
+        search = parse_search(data)
         if (
-            'man: "ssdp:discover"' in data.lower()
-            and discover_pattern is not None
+            search is None
+            or search.man.lower() != '"ssdp:discover"'
+            or search.search_target not in self.search_responses
         ):
-            mx = 0.0
-            mx_line = next(
-                (
-                    line
-                    for line in str(data).splitlines()
-                    if line.startswith("MX: ")
-                ),
-                None,
-            )
-            if mx_line:
-                mx_str = mx_line.split()[-1]
-                if mx_str.replace(".", "", 1).isnumeric():
-                    mx = float(mx_str)
+            return
 
-            self.respond_to_search(addr, discover_pattern, mx)
+        ssdp_logger.debug("Received search from %s: %s", addr, search)
+        search_target = search.search_target
+        mx = search.mx
+
+        metrics.ssdp_searches_total.inc(
+            "uuid" if search_target.startswith("uuid:") else search_target
+        )
+        self.respond_to_search(addr, search_target, mx)
 
     def respond_to_search(
-        self, addr: t.Tuple[str, int], discover_pattern: str, mx: float = 0.0
+        self, addr: t.Tuple[str, int], search_target: str, mx: float = 0.0
     ) -> None:
-        """Build and send an appropriate response to an SSDP search request.
+        """Send the matching devices' responses to an SSDP search request.
 
         Args:
             addr: Address sending search request
+            search_target: The `ST` searched for, e.g. "ssdp:all"; must be a
+                           key of `search_responses`
+            mx: Maximum seconds to wait before responding, from the request
 
         """
-        date_str = formatdate(timeval=None, localtime=False, usegmt=True)
-        for device in self.devices:
-            name = device["name"]
-            ip_address = device.get("ip_address")
-            port = device.get("port")
-
-            location = f"http://{ip_address}:{port}/setup.xml"
-            serial = make_serial(name)
-            usn = (
-                f"uuid:Socket-1_0-{serial}::"
-                f'{discover_pattern.lstrip("ST: ")}'
+        responses = self.search_responses[search_target]
+        window = max(0, min(5, mx))
+
+        now = time.monotonic()
+        recent = self._recent_searches
+        expiries = self._search_expiries
+        while expiries and expiries[0][0] <= now:
+            del recent[heapq.heappop(expiries)[1]]
+
+        key = (addr, search_target)
+        if key in recent:
+            ssdp_logger.debug(
+                "Ignoring repeated search from %s for %s", addr, search_target
             )
-
-            response = (Fauxmo.NEWLINE).join(
-                [
-                    "HTTP/1.1 200 OK",
-                    "CACHE-CONTROL: max-age=86400",
-                    f"DATE: {date_str}",
-                    "EXT:",
-                    f"LOCATION: {location}",
-                    'OPT: "http://schemas.upnp.org/upnp/1/0/"; ns=01',
-                    f"01-NLS: {uuid.uuid4()}",
-                    "SERVER: Fauxmo, UPnP/1.0, Unspecified",
-                    f"{discover_pattern}",
-                    f"USN: {usn}",
-                ]
-            ) + (2 * Fauxmo.NEWLINE)
-            asyncio.ensure_future(
-                self._send_async_response(response.encode("utf8"), addr, mx)
+            metrics.ssdp_responses_suppressed_total.inc(amount=len(responses))
+            return
+
+        # If full, answer without remembering, so repeats are answered too
+        if len(recent) < self.max_recent_searches:
+            until = now + window
+            recent[key] = until
+            heapq.heappush(expiries, (until, key))
+
+        host = self.location_host(addr[0]) if self.interfaces else None
+        dropped = 0
+        for response in responses:
+            if not self.scheduler.schedule(
+                random.random() * window, response, addr, host
+            ):
+                dropped += 1
+        if dropped:
+            ssdp_logger.warning(
+                "Dropped %s responses to %s: %s responses already pending",
+                dropped,
+                addr,
+                len(self.scheduler),
             )
+            metrics.ssdp_responses_dropped_total.inc(amount=dropped)
 
-    async def _send_async_response(
-        self, response: bytes, addr: t.Tuple[str, int], mx: float = 0.0
-    ) -> None:
-        logger.debug(f"Sending response to {addr} with mx {mx}:\n{response!r}")
-        await asyncio.sleep(random.random() * max(0, min(5, mx)))
+    def send(self, response: bytes, addr: t.Tuple[str, int]) -> None:
+        """Send a response datagram.
+
+        Args:
+            response: Rendered response
+            addr: Address to send it to
+
+        """
+        ssdp_logger.debug("Sending response to %s:\n%r", addr, response)
         self.transport.sendto(response, addr)
+        metrics.ssdp_responses_total.inc()
+
+    def notify(
+        self,
+        message: bytes,
+        addr: t.Tuple[str, int],
+        interface: str | None = None,
+    ) -> None:
+        """Send a `NOTIFY` datagram.
+
+        Args:
+            message: Rendered message
+            addr: Address to send it to, i.e. the SSDP multicast group
+            interface: Address of the interface to send it from, if not the
+                       system's choice
+
+        """
+        ssdp_logger.debug("Sending notification to %s:\n%r", addr, message)
+        if interface is None:
+            self.transport.sendto(message, addr)
+        else:
+            sock = self._multicast_socks.get(interface)
+            if sock is None:
+                sock = make_multicast_sock(interface)
+                self._multicast_socks[interface] = sock
+            try:
+                sock.sendto(message, addr)
+            except OSError as e:
+                ssdp_logger.warning(
+                    "Unable to send notification from %s: %s", interface, e
+                )
+                return
+        metrics.ssdp_notifications_total.inc()
+
+    def close(self) -> None:
+        """Say goodbye to controllers and close the transport."""
+        if self.announcer is not None:
+            self.announcer.stop()
+        for sock in self._multicast_socks.values():
+            sock.close()
+        self._multicast_socks.clear()
+        self.transport.close()
 
     def connection_lost(self, exc: Exception | None) -> None:
         """Handle lost connections.
@@ -446,4 +918,7 @@ class SSDPServer(asyncio.DatagramProtocol):
 
         """
         if exc:
-            logger.warning(f"SSDPServer closed with exception: {exc}")
+            ssdp_logger.warning("SSDPServer closed with exception: %s", exc)
+        self.scheduler.close()
+        if self.announcer is not None:
+            self.announcer.stop(byebye=False)
@@ -0,0 +1,119 @@
+"""reaper.py :: Close connections that stall or sit idle for too long.
+
+Rather than every connection scheduling and cancelling its own timer each
+time it receives data, deadlines are kept in a coarse timing wheel shared by
+all connections: each deadline is rounded up to a slot of `resolution`
+seconds, moving a connection between slots is a set operation, and a single
+timer handle expires the due slots while any deadline is pending.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import math
+import typing as t
+
+from fauxmo import metrics
+
+
+class Reapable(t.Protocol):
+    """A connection that can be closed by the `ConnectionReaper`."""
+
+    def reap(self, reason: str) -> None:
+        """Close the connection because its deadline has passed."""
+
+
+class ConnectionReaper:
+    """Track connection deadlines and close connections that exceed them."""
+
+    def __init__(self, resolution: float = 0.5) -> None:
+        """Initialize a ConnectionReaper.
+
+        Args:
+            resolution: Granularity of deadlines in seconds; connections are
+                        reaped up to this long after their deadline
+
+        """
+        self.resolution = resolution
+        self._deadlines: t.Dict[Reapable, t.Tuple[int, str]] = {}
+        self._slots: t.Dict[int, t.Set[Reapable]] = {}
+        self._handle: asyncio.TimerHandle | None = None
+        self._next_slot = 0
+
+    def __len__(self) -> int:
+        """Return the number of connections with a pending deadline."""
+        return len(self._deadlines)
+
+    def reason(self, conn: Reapable) -> str | None:
+        """Return the reason of a connection's pending deadline, if any."""
+        deadline = self._deadlines.get(conn)
+        return deadline[1] if deadline else None
+
+    def schedule(self, conn: Reapable, timeout: float, reason: str) -> None:
+        """Set the deadline of a connection, replacing any pending one.
+
+        Args:
+            conn: The connection
+            timeout: Seconds from now until it is reaped
+            reason: Why it would be reaped, e.g. "idle"; passed to
+                    `conn.reap` and used as the metrics label
+
+        """
+        loop = asyncio.get_running_loop()
+        slot = math.ceil((loop.time() + timeout) / self.resolution)
+        previous = self._deadlines.get(conn)
+        if previous is not None:
+            if previous[0] == slot:
+                self._deadlines[conn] = (slot, reason)
+                return
+            self._discard(conn, previous[0])
+
+        self._deadlines[conn] = (slot, reason)
+        self._slots.setdefault(slot, set()).add(conn)
+        if self._handle is None:
+            self._start()
+
+    def cancel(self, conn: Reapable) -> None:
+        """Clear the deadline of a connection, if it has one."""
+        previous = self._deadlines.pop(conn, None)
+        if previous is not None:
+            self._discard(conn, previous[0])
+
+    def _discard(self, conn: Reapable, slot: int) -> None:
+        """Remove a connection from a slot of the wheel."""
+        conns = self._slots[slot]
+        conns.discard(conn)
+        if not conns:
+            del self._slots[slot]
+
+    def _start(self) -> None:
+        """Schedule the next tick, at the end of the current slot."""
+        loop = asyncio.get_running_loop()
+        self._next_slot = math.floor(loop.time() / self.resolution) + 1
+        self._handle = loop.call_at(
+            self._next_slot * self.resolution, self._tick
+        )
+
+    def _tick(self) -> None:
+        """Reap the connections in every slot that has come due."""
+        self._handle = None
+
+        # The loop may run a timer marginally early
+        loop = asyncio.get_running_loop()
+        now = max(self._next_slot, math.floor(loop.time() / self.resolution))
+        for slot in sorted(slot for slot in self._slots if slot <= now):
+            for conn in self._slots.pop(slot):
+                _, reason = self._deadlines.pop(conn)
+                metrics.connections_reaped_total.inc(reason)
+                conn.reap(reason)
+
+        if self._deadlines:
+            self._start()
+
+    def close(self) -> None:
+        """Stop the timer and forget all deadlines."""
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        self._deadlines.clear()
+        self._slots.clear()
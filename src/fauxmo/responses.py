@@ -0,0 +1,429 @@
+"""responses.py :: Pre-rendered HTTP responses for Fauxmo devices.
+
+The Echo requests the same handful of documents from every device over and
+over, particularly during discovery. Everything in those responses except the
+`DATE` header is fixed for a given device, so the bodies and headers are
+rendered to `bytes` once, and only the date is spliced in per response. The
+same goes for the SSDP responses to the Echo's searches, which only vary in
+`DATE` and `01-NLS`.
+"""
+
+from __future__ import annotations
+
+import time
+import typing as t
+import uuid
+
+from fauxmo.utils import make_serial
+
+CRLF = "\r\n"
+
+SETUP_XML = (
+    '<?xml version="1.0"?>'
+    "<root>"
+    "<specVersion><major>1</major><minor>0</minor></specVersion>"
+    "<device>"
+    "<deviceType>urn:Belkin:device:controllee:1</deviceType>"
+    "<friendlyName>{name}</friendlyName>"
+    "<manufacturer>Belkin International Inc.</manufacturer>"
+    "<modelName>Emulated Socket</modelName>"
+    "<modelNumber>3.1415</modelNumber>"
+    "<serialNumber>{serial}</serialNumber>"
+    "<UDN>uuid:Socket-1_0-{serial}</UDN>"
+    "<serviceList>"
+    "<service>"
+    "<serviceType>urn:Belkin:service:basicevent:1</serviceType>"
+    "<serviceId>urn:Belkin:serviceId:basicevent1</serviceId>"
+    "<controlURL>{base_path}/upnp/control/basicevent1</controlURL>"
+    "<eventSubURL>{base_path}/upnp/event/basicevent1</eventSubURL>"
+    "<SCPDURL>{base_path}/eventservice.xml</SCPDURL>"
+    "</service>"
+    "<service>"
+    "<serviceType>urn:Belkin:service:metainfo:1</serviceType>"
+    "<serviceId>urn:Belkin:serviceId:metainfo1</serviceId>"
+    "<controlURL>{base_path}/upnp/control/metainfo1</controlURL>"
+    "<eventSubURL>{base_path}/upnp/event/metainfo1</eventSubURL>"
+    "<SCPDURL>{base_path}/metainfoservice.xml</SCPDURL>"
+    "</service>"
+    "</serviceList>"
+    "</device>"
+    "</root>"
+)
+
+METAINFO_XML = (
+    '<scpd xmlns="urn:Belkin:service-1-0">'
+    "<specVersion>"
+    "<major>1</major>"
+    "<minor>0</minor>"
+    "</specVersion>"
+    "<actionList>"
+    "<action>"
+    "<name>GetMetaInfo</name>"
+    "<argumentList>"
+    "<retval />"
+    "<name>GetMetaInfo</name>"
+    "<relatedStateVariable>MetaInfo</relatedStateVariable>"
+    "<direction>in</direction>"
+    "</argumentList>"
+    "</action>"
+    "</actionList>"
+    "<serviceStateTable>"
+    '<stateVariable sendEvents="yes">'
+    "<name>MetaInfo</name>"
+    "<dataType>string</dataType>"
+    "<defaultValue>0</defaultValue>"
+    "</stateVariable>"
+    "</serviceStateTable>"
+    "</scpd>"
+) + 2 * CRLF
+
+EVENTSERVICE_XML = (
+    '<scpd xmlns="urn:Belkin:service-1-0">'
+    "<actionList>"
+    "<action>"
+    "<name>SetBinaryState</name>"
+    "<argumentList>"
+    "<argument>"
+    "<retval/>"
+    "<name>BinaryState</name>"
+    "<relatedStateVariable>BinaryState</relatedStateVariable>"
+    "<direction>in</direction>"
+    "</argument>"
+    "</argumentList>"
+    "</action>"
+    "<action>"
+    "<name>GetBinaryState</name>"
+    "<argumentList>"
+    "<argument>"
+    "<retval/>"
+    "<name>BinaryState</name>"
+    "<relatedStateVariable>BinaryState</relatedStateVariable>"
+    "<direction>out</direction>"
+    "</argument>"
+    "</argumentList>"
+    "</action>"
+    "</actionList>"
+    "<serviceStateTable>"
+    '<stateVariable sendEvents="yes">'
+    "<name>BinaryState</name>"
+    "<dataType>Boolean</dataType>"
+    "<defaultValue>0</defaultValue>"
+    "</stateVariable>"
+    '<stateVariable sendEvents="yes">'
+    "<name>level</name>"
+    "<dataType>string</dataType>"
+    "<defaultValue>0</defaultValue>"
+    "</stateVariable>"
+    "</serviceStateTable>"
+    "</scpd>"
+) + 2 * CRLF
+
+SOAP_XML = (
+    "<s:Envelope "
+    'xmlns:s="http://schemas.xmlsoap.org/soap/envelope/" '
+    's:encodingStyle="http://schemas.xmlsoap.org/soap/encoding/">'
+    "<s:Body>"
+    "<u:{action}{action_type}Response "
+    'xmlns:u="urn:Belkin:service:basicevent:1">'
+    "<{action_type}>{return_val}</{action_type}>"
+    "</u:{action}{action_type}Response>"
+    "</s:Body>"
+    "</s:Envelope>"
+)
+
+DEVICE_TYPE = "urn:Belkin:device:controllee:1"
+SSDP_GROUP = "239.255.255.250"
+SSDP_PORT = 1900
+
+# IPv6 SSDP multicast groups: link-local, and optionally site-local
+SSDP_GROUP_V6 = "ff02::c"
+SSDP_GROUP_V6_SITE = "ff05::c"
+
+# Seconds for which controllers may cache a device advertised over SSDP
+MAX_AGE = 86400
+
+# Notification types announced for every device, besides its UUID
+NOTIFICATION_TYPES = (
+    "upnp:rootdevice",
+    DEVICE_TYPE,
+    "urn:Belkin:service:basicevent:1",
+)
+
+# Search targets answered by every device, without the `ST: ` prefix; each
+# device also answers a search for its own UUID
+SEARCH_TARGETS = (
+    "urn:Belkin:device:**",
+    DEVICE_TYPE,
+    "urn:Belkin:service:basicevent:1",
+    "upnp:rootdevice",
+    "ssdp:all",
+)
+
+# Day and month names for `DATE`, which must not depend on the locale
+_WEEKDAYS = "Mon Tue Wed Thu Fri Sat Sun".split()
+_MONTHS = "Jan Feb Mar Apr May Jun Jul Aug Sep Oct Nov Dec".split()
+
+_date_second: int | None = None
+_date_bytes = b""
+
+
+def http_date() -> bytes:
+    """Return the current time formatted for an HTTP `DATE` header.
+
+    The formatted value is cached and only regenerated once the clock has
+    moved on to a new second, which is the resolution of the header anyway.
+
+    Returns:
+        RFC 7231 formatted date as bytes
+
+    """
+    global _date_second, _date_bytes
+
+    now = int(time.time())
+    if now != _date_second:
+        tm = time.gmtime(now)
+        _date_bytes = (
+            f"{_WEEKDAYS[tm.tm_wday]}, {tm.tm_mday:02d} "
+            f"{_MONTHS[tm.tm_mon - 1]} {tm.tm_year:04d} "
+            f"{tm.tm_hour:02d}:{tm.tm_min:02d}:{tm.tm_sec:02d} GMT"
+        ).encode()
+        _date_second = now
+    return _date_bytes
+
+
+class Response:
+    """An HTTP response rendered to bytes except for its `DATE` header."""
+
+    __slots__ = ("head", "tail", "keep_alive_tail")
+
+    def __init__(self, body: str) -> None:
+        """Render the status line, headers and body of a response.
+
+        Args:
+            body: XML body of the response
+
+        """
+        encoded = body.encode("utf8")
+        self.head = CRLF.join(
+            [
+                "HTTP/1.1 200 OK",
+                f"CONTENT-LENGTH: {len(encoded)}",
+                "CONTENT-TYPE: text/xml",
+                "DATE: ",
+            ]
+        ).encode()
+        self.tail = self._render_tail(encoded, connection="close")
+        self.keep_alive_tail = self._render_tail(
+            encoded, connection="keep-alive"
+        )
+
+    @staticmethod
+    def _render_tail(body: bytes, connection: str) -> bytes:
+        """Render the headers following `DATE`, and the body."""
+        headers = CRLF.join(
+            [
+                "",
+                "LAST-MODIFIED: Sat, 01 Jan 2000 00:01:15 GMT",
+                "SERVER: Unspecified, UPnP/1.0, Unspecified",
+                "X-User-Agent: Fauxmo",
+                f"CONNECTION: {connection}{CRLF}",
+                "",
+            ]
+        )
+        return headers.encode() + body
+
+    def render(self, keep_alive: bool = False) -> bytes:
+        """Return the complete response with a current `DATE` header.
+
+        Args:
+            keep_alive: Whether to tell the client the connection stays open
+
+        """
+        tail = self.keep_alive_tail if keep_alive else self.tail
+        return self.head + http_date() + tail
+
+
+def device_uuid(serial: str) -> str:
+    """Return the UUID advertised for a device, e.g. in its `USN`."""
+    return f"uuid:Socket-1_0-{serial}"
+
+
+def url_host(address: str) -> str:
+    """Return an IP address as the host of a URL, bracketed if IPv6."""
+    if ":" in address:
+        return f"[{address}]"
+    return address
+
+
+def unique_service_name(serial: str, target: str) -> str:
+    """Return the `USN` of a device for a search or notification target."""
+    usn = device_uuid(serial)
+    if target == usn:
+        return usn
+    return f"{usn}::{target}"
+
+
+def notify_messages(
+    location: str, serial: str, alive: bool, group: str = SSDP_GROUP
+) -> t.List[bytes]:
+    """Render the SSDP `NOTIFY` messages announcing or retiring a device.
+
+    Args:
+        location: URL of the device's setup.xml
+        serial: Serial of the device, as returned by `make_serial`
+        alive: `True` for `ssdp:alive`, `False` for `ssdp:byebye`
+        group: Multicast group the messages are sent to, for `HOST`
+
+    Returns:
+        One message per notification type, including the device's UUID
+
+    """
+    messages = []
+    for target in (*NOTIFICATION_TYPES, device_uuid(serial)):
+        lines = ["NOTIFY * HTTP/1.1", f"HOST: {url_host(group)}:{SSDP_PORT}"]
+        if alive:
+            lines += [
+                f"CACHE-CONTROL: max-age={MAX_AGE}",
+                f"LOCATION: {location}",
+                "SERVER: Fauxmo, UPnP/1.0, Unspecified",
+            ]
+        lines += [
+            f"NT: {target}",
+            f"NTS: ssdp:{'alive' if alive else 'byebye'}",
+            f"USN: {unique_service_name(serial, target)}",
+            "",
+            "",
+        ]
+        messages.append(CRLF.join(lines).encode())
+    return messages
+
+
+class SearchResponse:
+    """An SSDP search response rendered to bytes except `DATE` and `01-NLS`.
+
+    The host in `LOCATION` can also be replaced per response, for devices
+    served on several interfaces.
+    """
+
+    __slots__ = ("head", "middle", "host", "after_host", "tail")
+
+    def __init__(
+        self,
+        ip_address: str,
+        port: int,
+        serial: str,
+        search_target: str,
+        base_path: str = "",
+    ) -> None:
+        """Render the fixed parts of a response to an SSDP search.
+
+        Args:
+            ip_address: IP address the device is served on
+            port: Port the device is served on
+            serial: Serial of the device, as returned by `make_serial`
+            search_target: The `ST` being answered, e.g. "upnp:rootdevice"
+            base_path: Path prefix of the device's endpoints, for devices
+                       sharing a port
+
+        """
+        usn = unique_service_name(serial, search_target)
+
+        self.head = CRLF.join(
+            [
+                "HTTP/1.1 200 OK",
+                f"CACHE-CONTROL: max-age={MAX_AGE}",
+                "DATE: ",
+            ]
+        ).encode()
+        self.middle = CRLF.join(["", "EXT:", "LOCATION: http://"]).encode()
+        self.host = url_host(ip_address).encode()
+        self.after_host = CRLF.join(
+            [
+                f":{port}{base_path}/setup.xml",
+                'OPT: "http://schemas.upnp.org/upnp/1/0/"; ns=01',
+                "01-NLS: ",
+            ]
+        ).encode()
+        self.tail = CRLF.join(
+            [
+                "",
+                "SERVER: Fauxmo, UPnP/1.0, Unspecified",
+                f"ST: {search_target}",
+                f"USN: {usn}",
+                "",
+                "",
+            ]
+        ).encode()
+
+    def render(self, host: bytes | None = None) -> bytes:
+        """Return the complete response with a current date and new NLS.
+
+        Args:
+            host: Host to use in `LOCATION` instead of the one it was
+                  rendered with, e.g. `b"10.0.0.2"`
+
+        """
+        nls = str(uuid.uuid4()).encode()
+        return b"".join(
+            (
+                self.head,
+                http_date(),
+                self.middle,
+                host or self.host,
+                self.after_host,
+                nls,
+                self.tail,
+            )
+        )
+
+
+class DeviceResponses:
+    """Every response a single Fauxmo device can send, rendered up front.
+
+    Built once per device at registration and shared by all of the `Fauxmo`
+    protocol instances serving that device.
+    """
+
+    def __init__(self, name: str, base_path: str = "") -> None:
+        """Render the responses for a device.
+
+        Args:
+            name: Friendly device name (e.g. "living room light")
+            base_path: Prefix for the URLs advertised in setup.xml, for
+                       devices sharing a port (e.g. "/<serial>")
+
+        """
+        self.name = name
+        self.serial = make_serial(name)
+
+        self.setup = Response(
+            SETUP_XML.format(
+                name=name, serial=self.serial, base_path=base_path
+            )
+        )
+        self.eventservice = Response(EVENTSERVICE_XML)
+        self.metainfo = Response(METAINFO_XML)
+
+        self.get_binary_state = self._soap_responses("Get", "BinaryState")
+        self.set_binary_state = self._soap_responses("Set", "BinaryState")
+        self.friendly_name = Response(
+            SOAP_XML.format(
+                action="Get", action_type="FriendlyName", return_val=name
+            )
+        )
+
+    @staticmethod
+    def _soap_responses(
+        action: str, action_type: str
+    ) -> t.Dict[str, Response]:
+        """Render a SOAP response for each possible `BinaryState` value."""
+        return {
+            return_val: Response(
+                SOAP_XML.format(
+                    action=action,
+                    action_type=action_type,
+                    return_val=return_val,
+                )
+            )
+            for return_val in ("0", "1")
+        }
@@ -0,0 +1,234 @@
+"""runner.py :: Run plugin methods without blocking the event loop.
+
+Most plugin methods are synchronous and frequently block on network requests
+or subprocesses. Calling them directly from a protocol would freeze SSDP
+discovery and every other device until they return, so they are run in a
+thread pool instead, and the result is awaited by the caller. Methods of an
+`AsyncFauxmoPlugin` are coroutines and are awaited directly.
+
+As the Echo polls device state far more often than most devices change, the
+runner can also cache each device's state for a configurable time.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+import typing as t
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from fauxmo import metrics, plugin_logger
+from fauxmo.plugins import AsyncFauxmoPlugin, BaseFauxmoPlugin
+
+
+class PluginQueueFull(RuntimeError):
+    """Raised when too many plugin calls are already running or queued."""
+
+
+class PluginRunner:
+    """Run plugin methods in a bounded thread pool.
+
+    `max_workers` of `0` runs plugin methods directly on the event loop, as
+    Fauxmo did before the thread pool was introduced. Plugins inheriting from
+    `AsyncFauxmoPlugin` never use the pool, and are not counted against
+    `queue_depth`.
+    """
+
+    def __init__(
+        self,
+        max_workers: int | None = None,
+        queue_depth: int | None = None,
+        state_ttl: float | None = None,
+    ) -> None:
+        """Initialize a PluginRunner.
+
+        Args:
+            max_workers: Number of worker threads; `None` uses the
+                         `ThreadPoolExecutor` default, `0` disables the pool
+            queue_depth: Maximum number of plugin calls running or waiting
+                         for a worker at once; `None` for no limit
+            state_ttl: Seconds for which a device's state is served from
+                       cache instead of calling `get_state`; `None` disables
+                       the cache
+
+        """
+        self.executor: ThreadPoolExecutor | None = None
+        if max_workers != 0:
+            self.executor = ThreadPoolExecutor(
+                max_workers=max_workers, thread_name_prefix="fauxmo-plugin"
+            )
+        self.queue_depth = queue_depth
+        self.pending = 0
+        self.state_ttl = state_ttl
+        self._get_state_calls: t.Dict[int, asyncio.Future] = {}
+        self._states: t.Dict[int, t.Tuple[str, float]] = {}
+
+    async def call(self, plugin: BaseFauxmoPlugin, method: str) -> t.Any:
+        """Call `method` on `plugin` and return its result.
+
+        A successful `on` or `off` also updates the cached state of the
+        device, if the state cache is enabled.
+
+        Args:
+            plugin: Plugin instance
+            method: Name of the method, e.g. "on", "off" or "get_state"
+
+        Returns:
+            Whatever the plugin method returns
+
+        Raises:
+            PluginQueueFull: If `queue_depth` calls are already pending
+
+        """
+        result = await self._call(plugin, method)
+        if method in ("on", "off") and result is True:
+            self._cache_state(plugin, method, time.monotonic())
+        return result
+
+    async def _call(self, plugin: BaseFauxmoPlugin, method: str) -> t.Any:
+        """Call the plugin method, recording its duration and outcome."""
+        labels = (type(plugin).__name__, method)
+        metrics.plugin_calls_total.inc(*labels)
+        plugin_logger.debug("Calling %s for %s", method, plugin.name)
+        started = time.perf_counter()
+        try:
+            result = await self._dispatch(plugin, method)
+        except Exception:
+            metrics.plugin_errors_total.inc(*labels)
+            raise
+        finally:
+            duration = time.perf_counter() - started
+            metrics.plugin_call_duration_seconds.observe(duration, *labels)
+
+        plugin_logger.debug(
+            "%s for %s returned %r in %.3fs",
+            method,
+            plugin.name,
+            result,
+            duration,
+        )
+        return result
+
+    async def _dispatch(self, plugin: BaseFauxmoPlugin, method: str) -> t.Any:
+        """Await or run the plugin method as appropriate for the plugin."""
+        if isinstance(plugin, AsyncFauxmoPlugin):
+            return await getattr(plugin, method)()
+
+        if self.executor is None:
+            return self._invoke(plugin, method)
+
+        if self.queue_depth is not None and self.pending >= self.queue_depth:
+            raise PluginQueueFull(
+                f"{self.pending} plugin calls pending, not calling "
+                f"{method} for {plugin.name}"
+            )
+
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self.executor, self._invoke, plugin, method
+            )
+        finally:
+            self.pending -= 1
+
+    async def get_state(self, plugin: BaseFauxmoPlugin) -> str:
+        """Get the state of `plugin`, from cache or a coalesced call.
+
+        Several Echos (or the Alexa app) often poll the same device at the
+        same moment. Rather than each making its own request to the backend,
+        callers arriving while a `get_state` call for the same plugin is in
+        flight share its result.
+
+        If the state cache is enabled, a state younger than `state_ttl` is
+        returned without calling the plugin at all. An older state is still
+        returned immediately, while a refresh runs in the background.
+
+        Args:
+            plugin: Plugin instance
+
+        Returns:
+            Result of the plugin's `get_state`
+
+        """
+        cached = self._states.get(id(plugin))
+        if cached is not None:
+            state, fetched = cached
+            if time.monotonic() - fetched >= t.cast(float, self.state_ttl):
+                self._get_state_call(plugin)
+            return state
+
+        # Shield the shared call so one caller being cancelled (e.g. when its
+        # connection is lost) doesn't cancel it for the others
+        return await asyncio.shield(self._get_state_call(plugin))
+
+    def _get_state_call(self, plugin: BaseFauxmoPlugin) -> asyncio.Future:
+        """Return the in-flight `get_state` call for a plugin, or start one."""
+        key = id(plugin)
+        call = self._get_state_calls.get(key)
+        if call is None:
+            call = asyncio.ensure_future(self._call(plugin, "get_state"))
+            self._get_state_calls[key] = call
+            call.add_done_callback(
+                partial(self._get_state_done, plugin, time.monotonic())
+            )
+        return call
+
+    def _get_state_done(
+        self, plugin: BaseFauxmoPlugin, started: float, call: asyncio.Future
+    ) -> None:
+        """Forget a completed `get_state` call and cache its result."""
+        del self._get_state_calls[id(plugin)]
+        if call.cancelled():
+            return
+
+        # Retrieving the exception also prevents a warning when nobody is
+        # waiting, e.g. for a background refresh
+        exc = call.exception()
+        if exc is not None:
+            plugin_logger.warning(
+                "Error getting state for %s: %r", plugin.name, exc
+            )
+            return
+
+        self._cache_state(plugin, call.result(), started)
+
+    def _cache_state(
+        self, plugin: BaseFauxmoPlugin, state: str, timestamp: float
+    ) -> None:
+        """Cache a device state, unless it is older than the cached one.
+
+        Args:
+            plugin: Plugin instance
+            state: State returned by `get_state`, or the successful action
+            timestamp: When the state was determined, from `time.monotonic`
+
+        """
+        if self.state_ttl is None:
+            return
+
+        key = id(plugin)
+        cached = self._states.get(key)
+        if cached is not None and cached[1] > timestamp:
+            return
+
+        if state.casefold() in ("on", "off"):
+            self._states[key] = (state, timestamp)
+        else:
+            self._states.pop(key, None)
+
+    @staticmethod
+    def _invoke(plugin: BaseFauxmoPlugin, method: str) -> t.Any:
+        """Look up and call the plugin method.
+
+        The lookup must happen in the worker thread, as
+        `FauxmoPlugin.__getattribute__` runs `on` and `off` when they are
+        accessed.
+        """
+        return getattr(plugin, method)()
+
+    def shutdown(self) -> None:
+        """Stop the worker threads, abandoning any calls not yet started."""
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
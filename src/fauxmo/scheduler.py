@@ -0,0 +1,125 @@
+"""scheduler.py :: Send delayed SSDP responses from a single timer.
+
+Each search is answered by every device after a random delay within the
+search's MX window. Rather than a task per response, pending responses are
+kept in a heap ordered by send time, and a single timer handle is scheduled
+for the earliest one. Responses that come due together are sent in bursts
+of at most `max_burst`, `pace_interval` apart, so that hundreds of devices
+don't overflow the receive buffer of the Echo that searched. The number of
+pending responses can be capped, so that a storm of searches can't grow the
+queue without bound.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import typing as t
+
+from fauxmo.responses import SearchResponse
+
+Address = t.Tuple[str, int]
+
+
+class ResponseScheduler:
+    """Queue rendered-on-send responses and send them when due."""
+
+    def __init__(
+        self,
+        send: t.Callable[[bytes, Address], None],
+        max_burst: int = 16,
+        pace_interval: float = 0.005,
+        max_pending: int | None = None,
+    ) -> None:
+        """Initialize a ResponseScheduler.
+
+        Args:
+            send: Sends a datagram to an address
+            max_burst: Maximum number of responses sent at once
+            pace_interval: Seconds between bursts while responses are overdue
+            max_pending: Maximum number of queued responses, or `None` for
+                         no limit
+
+        """
+        self.send = send
+        self.max_burst = max_burst
+        self.pace_interval = pace_interval
+        self.max_pending = max_pending
+        self._queue: t.List[
+            t.Tuple[float, int, SearchResponse, Address, t.Optional[bytes]]
+        ] = []
+        self._counter = itertools.count()
+        self._handle: asyncio.TimerHandle | None = None
+
+    def __len__(self) -> int:
+        """Return the number of responses waiting to be sent."""
+        return len(self._queue)
+
+    def schedule(
+        self,
+        delay: float,
+        response: SearchResponse,
+        addr: Address,
+        host: bytes | None = None,
+    ) -> bool:
+        """Queue a response to be rendered and sent after `delay` seconds.
+
+        Args:
+            delay: Seconds from now
+            response: Response to send
+            addr: Address to send it to
+            host: Host for the response's `LOCATION`, if not its own
+
+        Returns:
+            Whether the response was queued, i.e. `max_pending` wasn't reached
+
+        """
+        if (
+            self.max_pending is not None
+            and len(self._queue) >= self.max_pending
+        ):
+            return False
+
+        loop = asyncio.get_running_loop()
+        when = loop.time() + delay
+
+        # The counter breaks ties so responses are never compared
+        heapq.heappush(
+            self._queue, (when, next(self._counter), response, addr, host)
+        )
+        if self._handle is None or when < self._handle.when():
+            self._schedule_run(when)
+        return True
+
+    def _schedule_run(self, when: float) -> None:
+        """(Re)schedule the timer for `when`."""
+        if self._handle is not None:
+            self._handle.cancel()
+        loop = asyncio.get_running_loop()
+        self._handle = loop.call_at(when, self._run)
+
+    def _run(self) -> None:
+        """Send a burst of due responses and schedule the next run."""
+        self._handle = None
+        queue = self._queue
+        now = asyncio.get_running_loop().time()
+
+        sent = 0
+        while queue and queue[0][0] <= now and sent < self.max_burst:
+            _, _, response, addr, host = heapq.heappop(queue)
+            self.send(response.render(host), addr)
+            sent += 1
+
+        if queue:
+            when = queue[0][0]
+            if sent == self.max_burst:
+                when = max(when, now + self.pace_interval)
+            self._schedule_run(when)
+
+    def close(self) -> None:
+        """Stop the timer and discard pending responses."""
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        self._queue.clear()
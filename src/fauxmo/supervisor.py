@@ -0,0 +1,186 @@
+"""supervisor.py :: Run Fauxmo in several worker processes.
+
+With `--workers N`, the supervisor forks N workers, each of which runs
+`fauxmo.main` for its share of the configured devices. Every worker binds
+the SSDP port with `SO_REUSEPORT`; as Linux delivers each multicast datagram
+to every socket bound to the group and port, each worker answers searches
+for only its own devices, so every device is advertised exactly once.
+Workers that crash are restarted, with an increasing delay if they keep
+crashing soon after starting; after `max_failures` such crashes in a row the
+supervisor gives up, stops the other workers and exits with an error. The
+supervisor forwards `SIGINT` and `SIGTERM` to the workers and exits once they
+have.
+"""
+
+from __future__ import annotations
+
+import os
+import signal
+import time
+import typing as t
+from types import FrameType
+
+from fauxmo import logger
+
+
+class Supervisor:
+    """Fork workers and restart any that crash."""
+
+    def __init__(
+        self,
+        target: t.Callable[[int], None],
+        workers: int,
+        restart_delay: float = 1.0,
+        max_restart_delay: float = 30.0,
+        min_uptime: float = 10.0,
+        max_failures: int = 5,
+    ) -> None:
+        """Initialize a Supervisor.
+
+        Args:
+            target: Run in each worker process with the worker's index
+            workers: Number of worker processes
+            restart_delay: Seconds before restarting a crashed worker,
+                           doubled for each crash in a row within
+                           `min_uptime` of starting
+            max_restart_delay: Longest delay before restarting a worker
+            min_uptime: Seconds a worker must run for before crashing for the
+                        crash not to count as a failure to start
+            max_failures: Failures to start in a row after which the
+                          supervisor gives up
+
+        """
+        self.target = target
+        self.workers = workers
+        self.restart_delay = restart_delay
+        self.max_restart_delay = max_restart_delay
+        self.min_uptime = min_uptime
+        self.max_failures = max_failures
+        self.stopping = False
+        self.failed = False
+        self.pids: t.Dict[int, int] = {}
+        self._started: t.Dict[int, float] = {}
+        self._failures: t.Dict[int, int] = {}
+
+    def spawn(self, worker: int) -> int:
+        """Fork a worker process.
+
+        Args:
+            worker: Index of the worker, passed to `target`
+
+        Returns:
+            PID of the worker
+
+        """
+        pid = os.fork()
+        if pid == 0:
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                signal.signal(signum, signal.SIG_DFL)
+            code = 0
+            try:
+                self.target(worker)
+            except SystemExit as e:
+                code = e.code if isinstance(e.code, int) else 1
+            except BaseException:
+                logger.exception("Worker %s crashed", worker)
+                code = 1
+            finally:
+                os._exit(code)
+
+        logger.info("Started worker %s (pid %s)", worker, pid)
+        self.pids[pid] = worker
+        self._started[worker] = time.monotonic()
+        return pid
+
+    def stop(
+        self, signum: int = signal.SIGTERM, frame: FrameType | None = None
+    ) -> None:
+        """Stop restarting workers and signal them to shut down.
+
+        Args:
+            signum: Signal to forward to the workers
+            frame: Unused, for use as a signal handler
+
+        """
+        self.stopping = True
+        for pid in self.pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def run(self) -> int:
+        """Start the workers and supervise them until they have all exited.
+
+        A worker that exits with a non-zero status or is killed by a signal
+        is restarted, unless the supervisor is stopping; a worker that exits
+        cleanly is not.
+
+        Returns:
+            Exit status for the supervisor: 1 if it gave up on a worker that
+            kept failing to start, otherwise 0
+
+        """
+        handlers = {
+            signum: signal.signal(signum, self.stop)
+            for signum in (signal.SIGINT, signal.SIGTERM)
+        }
+        try:
+            self._supervise()
+        finally:
+            for signum, handler in handlers.items():
+                signal.signal(signum, handler)
+        return 1 if self.failed else 0
+
+    def _supervise(self) -> None:
+        """Start the workers and wait on them, restarting crashed ones."""
+        for worker in range(self.workers):
+            self.spawn(worker)
+
+        while self.pids:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            worker = self.pids.pop(pid)
+            code = os.waitstatus_to_exitcode(status)
+            if code == 0 or self.stopping:
+                logger.info("Worker %s exited (%s)", worker, code)
+                continue
+
+            uptime = time.monotonic() - self._started[worker]
+            if uptime < self.min_uptime:
+                failures = self._failures.get(worker, 0) + 1
+            else:
+                failures = 1
+            self._failures[worker] = failures
+
+            if failures >= self.max_failures:
+                logger.error(
+                    "Worker %s failed to start %s times in a row, giving up",
+                    worker,
+                    failures,
+                )
+                self.failed = True
+                self.stop()
+                continue
+
+            delay = min(
+                self.restart_delay * 2 ** (failures - 1),
+                self.max_restart_delay,
+            )
+            logger.warning(
+                "Worker %s died (%s), restarting in %.1f s",
+                worker,
+                code,
+                delay,
+            )
+            self._sleep(delay)
+            if not self.stopping:
+                self.spawn(worker)
+
+    def _sleep(self, seconds: float) -> None:
+        """Sleep, returning early if the supervisor is stopping."""
+        deadline = time.monotonic() + seconds
+        while not self.stopping and (now := time.monotonic()) < deadline:
+            time.sleep(min(deadline - now, 0.1))
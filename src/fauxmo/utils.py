@@ -3,6 +3,7 @@
 from __future__ import annotations
 
 import importlib.util
+import ipaddress
 import pathlib
 import socket
 import struct
@@ -15,6 +16,88 @@ from types import ModuleType
 from fauxmo import logger
 
 
+class Interface(t.NamedTuple):
+    """An IPv4 address of a local network interface."""
+
+    name: str
+    address: str
+    netmask: str
+
+    @property
+    def network(self) -> ipaddress.IPv4Network:
+        """Return the network the interface is connected to."""
+        return ipaddress.IPv4Network(
+            f"{self.address}/{self.netmask}", strict=False
+        )
+
+
+def get_interfaces() -> t.List[Interface]:
+    """List the IPv4 interfaces of this host without any network traffic.
+
+    Uses the `SIOCGIFADDR` and `SIOCGIFNETMASK` ioctls, so only works on
+    Linux; returns an empty list elsewhere.
+
+    Returns:
+        Interfaces with an IPv4 address, in the order of their index
+
+    """
+    if not sys.platform.startswith("linux"):
+        return []
+
+    import fcntl
+
+    siocgifaddr, siocgifnetmask = 0x8915, 0x891B
+    interfaces = []
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        for _, name in socket.if_nameindex():
+            ifreq = struct.pack("256s", name.encode()[:15])
+            try:
+                address = fcntl.ioctl(sock.fileno(), siocgifaddr, ifreq)
+                netmask = fcntl.ioctl(sock.fileno(), siocgifnetmask, ifreq)
+            except OSError:
+                # No IPv4 address
+                continue
+            interfaces.append(
+                Interface(
+                    name,
+                    socket.inet_ntoa(address[20:24]),
+                    socket.inet_ntoa(netmask[20:24]),
+                )
+            )
+    return interfaces
+
+
+def select_interfaces(names: str | t.Iterable[str]) -> t.List[Interface]:
+    """Look up the interfaces to serve on.
+
+    Args:
+        names: Interface names (e.g. `["eth0", "wlan0"]`), a single name
+               (e.g. "eth0"), or "all" for every interface except loopback
+
+    Returns:
+        The selected interfaces
+
+    Raises:
+        ValueError: If an interface is not found or has no IPv4 address
+
+    """
+    interfaces = get_interfaces()
+    if names == "all":
+        return [
+            interface
+            for interface in interfaces
+            if not interface.network.is_loopback
+        ]
+    if isinstance(names, str):
+        names = [names]
+
+    by_name = {interface.name: interface for interface in interfaces}
+    missing = [name for name in names if name not in by_name]
+    if missing:
+        raise ValueError(f"No IPv4 address found for interfaces: {missing}")
+    return [by_name[name] for name in names]
+
+
 def get_local_ip(ip_address: str | None = None) -> str:
     """Attempt to get the local network-connected IP address.
 
@@ -41,10 +124,59 @@ def get_local_ip(ip_address: str | None = None) -> str:
                 sock.connect(("8.8.8.8", 80))
                 ip_address = sock.getsockname()[0]
 
-    logger.debug(f"Using IP address: {ip_address}")
+    logger.debug("Using IP address: %s", ip_address)
     return str(ip_address)
 
 
+def get_local_ip6(ip_address: str | None = None) -> str:
+    """Attempt to get the local network-connected IPv6 address.
+
+    Link-local addresses are skipped in favour of global or unique local
+    ones, as a link-local `LOCATION` would need a zone index that means
+    nothing to the Echo.
+
+    Args:
+        ip_address: Either desired IPv6 address or "auto"
+
+    Returns:
+        Current IPv6 address as string
+
+    Raises:
+        ValueError: If no routable IPv6 address is found
+
+    """
+    if ip_address is not None and ip_address.lower() != "auto":
+        logger.debug("Using IPv6 address: %s", ip_address)
+        return ip_address
+
+    logger.debug("Attempting to get IPv6 address automatically")
+
+    # Address of the default route; connecting a UDP socket sends nothing
+    try:
+        with socket.socket(socket.AF_INET6, socket.SOCK_DGRAM) as sock:
+            sock.connect(("2001:4860:4860::8888", 80))
+            candidates = [sock.getsockname()[0]]
+    except OSError:
+        candidates = []
+
+    try:
+        candidates += [
+            str(info[4][0])
+            for info in socket.getaddrinfo(
+                socket.gethostname(), None, socket.AF_INET6
+            )
+        ]
+    except socket.gaierror:
+        pass
+
+    for candidate in candidates:
+        address = ipaddress.IPv6Address(candidate.partition("%")[0])
+        if not (address.is_link_local or address.is_loopback):
+            logger.debug("Using IPv6 address: %s", address)
+            return str(address)
+    raise ValueError("No routable IPv6 address found, set `ipv6_address`")
+
+
 def make_serial(name: str) -> str:
     """Create a persistent UUID from the device name.
 
@@ -85,7 +217,7 @@ def module_from_file(modname: str, path_str: str) -> ModuleType:
     return module
 
 
-def make_udp_sock() -> socket.socket:
+def make_udp_sock(addresses: t.Sequence[str] = ()) -> socket.socket:
     """Make a suitable udp socket to listen for device discovery requests.
 
     I would *love* to get rid of this function and just use the built-in
@@ -94,6 +226,10 @@ def make_udp_sock() -> socket.socket:
     thrilled if someone can figure this out in a better way than this or
     <https://github.com/n8henrie/fauxmo/blob/c5419b3f61311e5386387e136d26dd8d4a55518c/src/fauxmo/protocols.py#L149>.
 
+    Args:
+        addresses: Addresses of the interfaces on which to join the SSDP
+                   multicast group; the system's choice of interface if empty
+
     Returns:
         Socket suitable for responding to multicast requests
 
@@ -108,9 +244,116 @@ def make_udp_sock() -> socket.socket:
     sock.bind(("", 1900))
 
     group = socket.inet_aton("239.255.255.250")
-    mreq = struct.pack("4sL", group, socket.INADDR_ANY)
-    sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
+    if not addresses:
+        mreq = struct.pack("4sL", group, socket.INADDR_ANY)
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
+    for address in addresses:
+        mreq = group + socket.inet_aton(address)
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
+
+    return sock
+
+
+def make_udp6_sock(
+    groups: t.Sequence[str], interface_index: int = 0
+) -> socket.socket:
+    """Make a udp socket to listen for device discovery requests over IPv6.
 
+    Args:
+        groups: IPv6 SSDP multicast groups to join, e.g. `["ff02::c"]`
+        interface_index: Index of the interface on which to join them; the
+                         system's choice of interface if `0`
+
+    Returns:
+        IPv6-only socket suitable for responding to multicast requests
+
+    """
+    sock = socket.socket(socket.AF_INET6, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+
+    reuseport = getattr(socket, "SO_REUSEPORT", None)
+    if reuseport:
+        sock.setsockopt(socket.SOL_SOCKET, reuseport, 1)
+
+    # Leave IPv4 searches to the socket from `make_udp_sock`
+    sock.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_V6ONLY, 1)
+    sock.bind(("::", 1900))
+
+    for group in groups:
+        mreq = socket.inet_pton(socket.AF_INET6, group) + struct.pack(
+            "@I", interface_index
+        )
+        sock.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_JOIN_GROUP, mreq)
+    if interface_index:
+        sock.setsockopt(
+            socket.IPPROTO_IPV6, socket.IPV6_MULTICAST_IF, interface_index
+        )
+
+    return sock
+
+
+def attach_search_filter(sock: socket.socket) -> bool:
+    """Have the kernel drop datagrams to an SSDP socket that aren't searches.
+
+    Attaches a classic BPF program (`SO_ATTACH_FILTER`) accepting only UDP
+    payloads that start with `M-SEARCH`, so that the `NOTIFY`s and responses
+    of other devices never wake the event loop. Linux only.
+
+    Args:
+        sock: Socket from `make_udp_sock` or `make_udp6_sock`
+
+    Returns:
+        Whether the filter was attached
+
+    """
+    if not sys.platform.startswith("linux"):
+        logger.warning("SSDP kernel filter is only supported on Linux")
+        return False
+
+    import ctypes
+
+    # The filter sees the UDP header (8 bytes) followed by the payload
+    ld_word, jeq, ret = 0x20, 0x15, 0x06
+    program = [
+        (ld_word, 0, 0, 8),
+        (jeq, 0, 3, int.from_bytes(b"M-SE", "big")),
+        (ld_word, 0, 0, 12),
+        (jeq, 0, 1, int.from_bytes(b"ARCH", "big")),
+        (ret, 0, 0, 0xFFFFFFFF),
+        (ret, 0, 0, 0),
+    ]
+    filters = ctypes.create_string_buffer(
+        b"".join(struct.pack("HBBI", *insn) for insn in program)
+    )
+    fprog = struct.pack("HP", len(program), ctypes.addressof(filters))
+
+    try:
+        sock.setsockopt(
+            socket.SOL_SOCKET,
+            getattr(socket, "SO_ATTACH_FILTER", 26),
+            fprog,
+        )
+    except OSError as e:
+        logger.warning("Unable to attach SSDP kernel filter: %s", e)
+        return False
+    return True
+
+
+def make_multicast_sock(address: str) -> socket.socket:
+    """Make a non-blocking socket sending multicast from an interface.
+
+    Args:
+        address: Address of the interface to send from
+
+    Returns:
+        Socket with `IP_MULTICAST_IF` set to the interface
+
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(
+        socket.IPPROTO_IP, socket.IP_MULTICAST_IF, socket.inet_aton(address)
+    )
+    sock.setblocking(False)
     return sock
 
 
@@ -2,18 +2,31 @@
 
 from __future__ import annotations
 
+import asyncio
 import json
 import socket
 import time
+from contextlib import asynccontextmanager
+from functools import partial
 from multiprocessing import Process
 from threading import Thread
 from types import TracebackType
-from typing import Callable, Iterator, Type
+from typing import (
+    Any,
+    AsyncContextManager,
+    AsyncIterator,
+    Callable,
+    Iterator,
+    Type,
+)
 
 import httpbin
 import pytest
 
 from fauxmo import fauxmo
+from fauxmo.plugins import BaseFauxmoPlugin
+from fauxmo.plugins.commandlineplugin import CommandLinePlugin
+from fauxmo.protocols import Fauxmo
 from fauxmo.utils import get_local_ip
 
 
@@ -25,9 +38,16 @@ class TestFauxmoServer:
     terminate examples with different configurations.
     """
 
-    def __init__(self, config_path_str: str) -> None:
-        """Initialize test Fauxmo server with path to config."""
+    def __init__(self, config_path_str: str, host: str | None = None) -> None:
+        """Initialize test Fauxmo server with path to config.
+
+        Args:
+            config_path_str: Path to the config
+            host: Address the devices are served on, if not `get_local_ip()`
+
+        """
         self.config_path_str = config_path_str
+        self.host = host
         with open(config_path_str) as f:
             config = json.load(f)
         first_plugin = [*config["PLUGINS"].values()][0]
@@ -41,7 +61,7 @@ class TestFauxmoServer:
         )
         self.server.start()
 
-        local_ip = get_local_ip()
+        local_ip = self.host or get_local_ip()
         for _retry in range(10):
             try:
                 with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
@@ -70,6 +90,44 @@ def fauxmo_server() -> Callable[[str], TestFauxmoServer]:
     return TestFauxmoServer
 
 
+@asynccontextmanager
+async def serve_device(
+    plugin: BaseFauxmoPlugin | None = None,
+    name: str = "test device",
+    **kwargs: Any,
+) -> AsyncIterator[int]:
+    """Serve a single device on localhost within the running event loop.
+
+    Args:
+        plugin: Device to serve, by default a `CommandLinePlugin` whose
+                commands always succeed
+        name: Name of the default `CommandLinePlugin`
+        kwargs: Passed on to `Fauxmo`, e.g. `keep_alive_timeout`
+
+    Yields:
+        The port the device is served on
+
+    """
+    if plugin is None:
+        plugin = CommandLinePlugin(
+            name=name, port=0, on_cmd="true", off_cmd="false"
+        )
+    loop = asyncio.get_running_loop()
+    fauxmo = partial(Fauxmo, name=plugin.name, plugin=plugin, **kwargs)
+    server = await loop.create_server(fauxmo, host="127.0.0.1", port=0)
+    try:
+        yield server.sockets[0].getsockname()[1]
+    finally:
+        server.close()
+        await server.wait_closed()
+
+
+@pytest.fixture(scope="function")
+def device_server() -> Callable[..., AsyncContextManager[int]]:
+    """Provide `serve_device`, to serve a device in a test's event loop."""
+    return serve_device
+
+
 @pytest.fixture(scope="session")
 def simplehttpplugin_target() -> Iterator:
     """Simulate the endpoints triggered by SimpleHTTPPlugin."""
@@ -0,0 +1,128 @@
+"""test_admission.py :: Tests for connection and request rate limits."""
+
+import asyncio
+import logging
+import typing as t
+
+import pytest
+
+from fauxmo import admission as admission_module, metrics
+from fauxmo.admission import AdmissionController, TokenBucket
+
+
+def test_token_bucket() -> None:
+    """Test that a bucket allows bursts and refills at its rate."""
+    bucket = TokenBucket(rate=2, burst=2)
+    now = bucket.updated
+    assert bucket.take(now)
+    assert bucket.take(now)
+    assert not bucket.take(now)
+    assert bucket.take(now + 0.5)
+    assert not bucket.take(now + 0.5)
+
+
+def test_connection_limits() -> None:
+    """Test the global and per-device connection caps."""
+    admission = AdmissionController(
+        max_connections=3, max_connections_per_device=2
+    )
+    assert admission.admit("one", "10.0.0.1")
+    assert admission.admit("one", "10.0.0.2")
+    assert not admission.admit("one", "10.0.0.3")
+    assert admission.admit(None, "10.0.0.3")
+    assert not admission.admit("two", "10.0.0.4")
+
+    admission.release("one")
+    admission.release(None)
+    assert admission.admit("two", "10.0.0.4")
+    assert admission.device_connections == {"one": 1, "two": 1}
+
+
+def test_rejection_warnings(
+    caplog: pytest.LogCaptureFixture, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that rejections are warned about at most once per interval."""
+    admission = AdmissionController(max_connections=0)
+    with caplog.at_level(logging.DEBUG, logger="fauxmo.http"):
+        for host in ("10.0.0.1", "10.0.0.1", "10.0.0.2", "10.0.0.1"):
+            assert not admission.admit("one", host)
+        monkeypatch.setattr(admission_module, "REJECTION_WARNING_INTERVAL", 0)
+        assert not admission.admit("one", "10.0.0.1")
+
+    warnings = [
+        record.getMessage()
+        for record in caplog.records
+        if record.levelno == logging.WARNING
+    ]
+    assert warnings == [
+        "Rejected 10.0.0.1 for one: connection_limit "
+        "(0 more since the last warning)",
+        "Rejected 10.0.0.2 for one: connection_limit "
+        "(0 more since the last warning)",
+        "Rejected 10.0.0.1 for one: connection_limit "
+        "(2 more since the last warning)",
+    ]
+    assert len(caplog.records) == 5
+
+
+def test_rejected_connection(
+    device_server: t.Callable[..., t.AsyncContextManager[int]]
+) -> None:
+    """Test that a device server closes connections over its limit."""
+    admission = AdmissionController(max_connections_per_device=1)
+    before = metrics.rejected_total.values.get(("device_connection_limit",))
+    setup_request = b"GET /setup.xml HTTP/1.1\r\nHost: fauxmo\r\n\r\n"
+
+    async def run() -> bytes:
+        async with device_server(
+            name="limited", keep_alive_timeout=1, admission=admission
+        ) as port:
+            first_reader, first_writer = await asyncio.open_connection(
+                "127.0.0.1", port
+            )
+            first_writer.write(setup_request)
+            await first_reader.readuntil(b"</root>")
+
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(setup_request)
+            # Closed without a response, by a reset or not
+            with pytest.raises(
+                (ConnectionResetError, asyncio.IncompleteReadError)
+            ):
+                await asyncio.wait_for(reader.readuntil(b"</root>"), 1)
+
+            # The slot is freed once the first connection is closed
+            first_writer.close()
+            await asyncio.sleep(0.01)
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(setup_request)
+            accepted = await reader.readuntil(b"</root>")
+
+            writer.close()
+        return accepted
+
+    accepted = asyncio.run(run())
+    assert accepted.startswith(b"HTTP/1.1 200 OK")
+    after = metrics.rejected_total.values[("device_connection_limit",)]
+    assert after == (before or 0) + 1
+
+
+def test_rate_limit(
+    device_server: t.Callable[..., t.AsyncContextManager[int]]
+) -> None:
+    """Test that a client exceeding its rate is disconnected."""
+    admission = AdmissionController(rate=0.1, burst=2)
+    setup_request = b"GET /setup.xml HTTP/1.1\r\nHost: fauxmo\r\n\r\n"
+
+    async def run() -> bytes:
+        async with device_server(
+            name="rate limited", keep_alive_timeout=1, admission=admission
+        ) as port:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(setup_request * 3)
+            response = await asyncio.wait_for(reader.read(), timeout=1)
+
+            writer.close()
+        return response
+
+    assert asyncio.run(run()).count(b"HTTP/1.1 200 OK") == 2
@@ -0,0 +1,63 @@
+"""test_announcer.py :: Tests for SSDP NOTIFY announcements."""
+
+import asyncio
+import typing as t
+
+from fauxmo.announcer import Address, Announcer
+from fauxmo.responses import device_uuid, notify_messages
+from fauxmo.utils import make_serial
+
+
+def test_notify_messages() -> None:
+    """Test rendering of ssdp:alive and ssdp:byebye messages."""
+    serial = make_serial("notified")
+    alive = notify_messages("http://10.0.0.2:5/setup.xml", serial, alive=True)
+    byebye = notify_messages("http://10.0.0.2:5/setup.xml", serial, False)
+
+    assert len(alive) == len(byebye) == 4
+    assert alive[0].startswith(b"NOTIFY * HTTP/1.1\r\n")
+    assert b"NTS: ssdp:alive\r\n" in alive[0]
+    assert b"LOCATION: http://10.0.0.2:5/setup.xml\r\n" in alive[0]
+    assert b"NTS: ssdp:byebye\r\n" in byebye[0]
+    assert b"LOCATION" not in byebye[0]
+    assert alive[-1].endswith(
+        f"NT: {device_uuid(serial)}\r\nNTS: ssdp:alive\r\n"
+        f"USN: {device_uuid(serial)}\r\n\r\n".encode()
+    )
+
+
+def test_announcer() -> None:
+    """Test that devices are announced repeatedly and retired on stop."""
+    sent: t.List[t.Tuple[float, bytes, Address]] = []
+    announcer = Announcer(
+        lambda data, addr: sent.append((loop.time(), data, addr)),
+        max_age=0.2,
+        initial_delay=0.02,
+    )
+    announcer.add_device([b"alive 0"], [b"byebye 0"])
+
+    async def run() -> None:
+        announcer.start()
+        announcer.add_device([b"alive 1"], [b"byebye 1"])
+        await asyncio.sleep(0.3)
+        announcer.stop()
+
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(run())
+    finally:
+        loop.close()
+
+    messages = [data for _, data, _ in sent]
+    assert {addr for _, _, addr in sent} == {("239.255.255.250", 1900)}
+
+    # First within `initial_delay`, then every 0.05 to 0.1 seconds
+    for idx in range(2):
+        times = [when for when, data, _ in sent if data == b"alive %d" % idx]
+        assert times[0] - sent[0][0] <= 0.02
+        assert 3 <= len(times) <= 7
+    assert messages[-2:] == [b"byebye 0", b"byebye 1"]
+
+    # Nothing more after the first stop
+    announcer.stop()
+    assert len(sent) == len(messages)
@@ -1,20 +1,45 @@
 """test_fauxmo.py :: Tests for `fauxmo` package."""
 
+import asyncio
+import errno
+import json
+import pathlib
 import socket
+import subprocess
+import sys
 import typing as t
+from functools import partial
 import xml.etree.ElementTree as ET  # noqa
 
 import pytest
 import requests
 
-from fauxmo import fauxmo
-from fauxmo.protocols import Fauxmo
-from fauxmo.utils import get_unused_port
+from fauxmo import fauxmo, metrics
+from fauxmo.parser import HTTPRequest
+from fauxmo.plugins import AsyncFauxmoPlugin
+from fauxmo.plugins.commandlineplugin import CommandLinePlugin
+from fauxmo.protocols import Fauxmo, FauxmoMultiplexer, SSDPServer
+from fauxmo.responses import DeviceResponses, http_date, url_host
+from fauxmo.runner import PluginQueueFull, PluginRunner
+from fauxmo.utils import (
+    attach_search_filter,
+    get_interfaces,
+    get_unused_port,
+    make_serial,
+    select_interfaces,
+)
 
 
 def test_udp_search(fauxmo_server: t.Callable) -> None:
     """Test device search request to UPnP / SSDP server."""
-    msg = b'MAN: "ssdp:discover"' + b"ST: urn:Belkin:device:**"
+    msg = (
+        b"M-SEARCH * HTTP/1.1\r\n"
+        b"HOST: 239.255.255.250:1900\r\n"
+        b'MAN: "ssdp:discover"\r\n'
+        b"MX: 1\r\n"
+        b"ST: urn:Belkin:device:**\r\n"
+        b"\r\n"
+    )
     addr = ("239.255.255.250", 1900)
 
     with fauxmo_server("tests/test_config.json"):
@@ -32,6 +57,61 @@ def test_udp_search(fauxmo_server: t.Callable) -> None:
     assert b"/setup.xml" in data
 
 
+@pytest.mark.skipif(
+    not sys.platform.startswith("linux") or not socket.has_ipv6,
+    reason="Requires Linux interfaces and IPv6",
+)
+def test_interfaces_and_ipv6(
+    fauxmo_server: t.Callable, tmp_path: pathlib.Path
+) -> None:
+    """Test serving on selected interfaces and over IPv6 at once."""
+    port = 12360
+    config = {
+        "FAUXMO": {"interfaces": ["lo"], "ipv6_address": "::1"},
+        "PLUGINS": {
+            "CommandLinePlugin": {
+                "DEVICES": [
+                    {
+                        "name": "dual stack",
+                        "port": port,
+                        "on_cmd": "true",
+                        "off_cmd": "true",
+                    }
+                ]
+            }
+        },
+    }
+    config_path = tmp_path / "config.json"
+    config_path.write_text(json.dumps(config))
+    search = (
+        b"M-SEARCH * HTTP/1.1\r\n"
+        b'MAN: "ssdp:discover"\r\n'
+        b"MX: 0\r\n"
+        b"ST: urn:Belkin:device:**\r\n"
+        b"\r\n"
+    )
+
+    locations = []
+    with fauxmo_server(str(config_path), host="127.0.0.1"):
+        for family, host in (
+            (socket.AF_INET, "127.0.0.1"),
+            (socket.AF_INET6, "::1"),
+        ):
+            resp = requests.get(f"http://{url_host(host)}:{port}/setup.xml")
+            assert resp.status_code == 200
+
+            with socket.socket(family, socket.SOCK_DGRAM) as sock:
+                sock.settimeout(2)
+                sock.sendto(search, (host, 1900))
+                data = sock.recv(4096)
+            locations.append(data.split(b"LOCATION: ")[1].split(b"\r\n")[0])
+
+    assert locations == [
+        f"http://127.0.0.1:{port}/setup.xml".encode(),
+        f"http://[::1]:{port}/setup.xml".encode(),
+    ]
+
+
 def test_setup(fauxmo_server: t.Callable) -> None:
     """Test TCP server's `/setup.xml` endpoint."""
     with fauxmo_server("tests/test_config.json") as fauxmo_ip:
@@ -112,6 +192,341 @@ def test_content_length() -> None:
     assert "CONTENT-LENGTH: 4" in Fauxmo.add_http_headers("föo")
 
 
+def test_device_responses() -> None:
+    """Test that pre-rendered responses only vary by their `DATE` header."""
+    responses = DeviceResponses("fake switch one")
+
+    setup = responses.setup.render()
+    assert b"<friendlyName>fake switch one</friendlyName>" in setup
+    assert b"DATE: " + http_date() + b"\r\n" in setup
+
+    header, _, body = setup.partition(b"\r\n\r\n")
+    assert f"CONTENT-LENGTH: {len(body)}".encode() in header
+
+    on_response = responses.get_binary_state["1"].render()
+    assert b"<BinaryState>1</BinaryState>" in on_response
+    assert b"<FriendlyName>fake switch one</FriendlyName>" in (
+        responses.friendly_name.render()
+    )
+
+
+def test_search_responses() -> None:
+    """Test that SSDP responses are pre-rendered per search target."""
+    server = SSDPServer(
+        [{"name": "search one", "ip_address": "10.0.0.2", "port": 12345}]
+    )
+    server.add_device("search two", "10.0.0.2", 12346, base_path="/two")
+
+    responses = server.search_responses["upnp:rootdevice"]
+    assert len(responses) == 2
+    first, second = (response.render() for response in responses)
+    assert first.endswith(b"\r\n\r\n")
+    assert b"DATE: " + http_date() + b"\r\n" in first
+    assert b"LOCATION: http://10.0.0.2:12345/setup.xml\r\n" in first
+    assert b"LOCATION: http://10.0.0.2:12346/two/setup.xml\r\n" in second
+    assert (
+        f"USN: uuid:Socket-1_0-{make_serial('search two')}::upnp:rootdevice"
+    ).encode() in second
+
+    # A new NLS is generated for every response
+    assert (
+        first.split(b"01-NLS: ")[1][:36]
+        != responses[0].render().split(b"01-NLS: ")[1][:36]
+    )
+
+
+def test_keep_alive(
+    device_server: t.Callable[..., t.AsyncContextManager[int]]
+) -> None:
+    """Test pipelined requests on a persistent connection and idle close."""
+    setup_request = b"GET /setup.xml HTTP/1.1\r\nHost: fauxmo\r\n\r\n"
+
+    async def run() -> t.Tuple[bytes, bytes, bytes]:
+        async with device_server(
+            name="keep alive", keep_alive_timeout=0.1
+        ) as port:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(setup_request * 2)
+            first = await reader.readuntil(b"</root>")
+            second = await reader.readuntil(b"</root>")
+            remaining = await asyncio.wait_for(reader.read(), timeout=1)
+
+            writer.close()
+        return first, second, remaining
+
+    first, second, remaining = asyncio.run(run())
+    assert b"CONNECTION: keep-alive" in first
+    assert b"CONNECTION: keep-alive" in second
+    assert remaining == b""
+
+
+def test_plugin_runner() -> None:
+    """Test that plugin calls run in the pool and respect the queue depth."""
+    plugin = CommandLinePlugin(
+        name="slow", port=0, on_cmd="sleep 0.2", off_cmd="false"
+    )
+    runner = PluginRunner(max_workers=1, queue_depth=1)
+
+    async def run() -> bool:
+        slow_call = asyncio.ensure_future(runner.call(plugin, "on"))
+        await asyncio.sleep(0)
+
+        # The event loop is free while the plugin blocks
+        assert not slow_call.done()
+        with pytest.raises(PluginQueueFull):
+            await runner.call(plugin, "off")
+        return await slow_call
+
+    assert asyncio.run(run()) is True
+    runner.shutdown()
+
+
+class AsyncFakeStatePlugin(AsyncFauxmoPlugin):
+    """Minimal AsyncFauxmoPlugin with fake state."""
+
+    async def on(self) -> bool:
+        """Turn on after yielding to the event loop."""
+        await asyncio.sleep(0)
+        return True
+
+    async def off(self) -> bool:
+        """Fail to turn off."""
+        return False
+
+    async def get_state(self) -> str:
+        """Return the latest successful action."""
+        return await super().get_state()
+
+
+def test_async_plugin() -> None:
+    """Test that AsyncFauxmoPlugin methods are awaited on the event loop."""
+    plugin = AsyncFakeStatePlugin(name="async", port=0, initial_state="off")
+    runner = PluginRunner(max_workers=1, queue_depth=0)
+
+    async def run() -> t.List[t.Any]:
+        return [
+            await runner.call(plugin, "on"),
+            await runner.call(plugin, "off"),
+            await runner.call(plugin, "get_state"),
+        ]
+
+    assert asyncio.run(run()) == [True, False, "on"]
+    runner.shutdown()
+
+
+def test_multiplexer() -> None:
+    """Test routing requests to devices sharing a port by path prefix."""
+    devices = {}
+    for name in ["shared one", "shared two"]:
+        serial = make_serial(name)
+        plugin = CommandLinePlugin(
+            name=name, port=0, on_cmd="true", off_cmd="false"
+        )
+        responses = DeviceResponses(name, base_path=f"/{serial}")
+        devices[serial] = (plugin, responses)
+    second = make_serial("shared two")
+
+    async def request(port: int, path: str) -> bytes:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(f"GET {path} HTTP/1.1\r\n\r\n".encode())
+        response = await reader.read()
+        writer.close()
+        return response
+
+    async def run() -> t.Tuple[bytes, bytes]:
+        loop = asyncio.get_running_loop()
+        multiplexer = partial(FauxmoMultiplexer, devices=devices)
+        server = await loop.create_server(multiplexer, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+
+        setup = await request(port, f"/{second}/setup.xml")
+        unknown = await request(port, "/setup.xml")
+
+        server.close()
+        await server.wait_closed()
+        return setup, unknown
+
+    setup, unknown = asyncio.run(run())
+    assert b"<friendlyName>shared two</friendlyName>" in setup
+    assert f"<SCPDURL>/{second}/eventservice.xml".encode() in setup
+    assert unknown == b""
+
+
+def test_register_action() -> None:
+    """Test registering a SOAP action on a subclass of Fauxmo."""
+
+    class CustomFauxmo(Fauxmo):
+        """Fauxmo with an extra SOAP action."""
+
+    @CustomFauxmo.register_action("GetSignalStrength")
+    async def get_signal_strength(
+        fauxmo: Fauxmo, request: HTTPRequest
+    ) -> None:
+        """Fail to get signal strength."""
+
+    request = HTTPRequest(
+        "POST",
+        "/upnp/control/basicevent1",
+        "HTTP/1.1",
+        {"soapaction": '"urn:Belkin:service:basicevent:1#GetSignalStrength"'},
+    )
+    action = Fauxmo.parse_soapaction(request)
+    assert action == "getsignalstrength"
+    assert CustomFauxmo.soap_actions[action] is get_signal_strength
+    assert action not in Fauxmo.soap_actions
+    assert "getbinarystate" in CustomFauxmo.soap_actions
+
+
+def test_get_state_coalescing() -> None:
+    """Test that concurrent get_state calls for a device share one call."""
+    plugin = AsyncFakeStatePlugin(name="async", port=0, initial_state="on")
+    other = AsyncFakeStatePlugin(name="other", port=0, initial_state="off")
+    runner = PluginRunner(max_workers=0)
+    calls: t.List[str] = []
+
+    async def slow_get_state() -> str:
+        calls.append(plugin.name)
+        await asyncio.sleep(0.05)
+        return "on"
+
+    plugin.get_state = slow_get_state  # type: ignore
+
+    async def run() -> t.List[str]:
+        states = await asyncio.gather(
+            runner.get_state(plugin),
+            runner.get_state(plugin),
+            runner.get_state(other),
+            runner.get_state(plugin),
+        )
+        return list(states)
+
+    assert asyncio.run(run()) == ["on", "on", "off", "on"]
+    assert len(calls) == 1
+
+    asyncio.run(run())
+    assert len(calls) == 2
+
+
+def test_state_cache() -> None:
+    """Test the state cache, including stale-while-revalidate."""
+    plugin = AsyncFakeStatePlugin(name="cached", port=0, initial_state="off")
+    runner = PluginRunner(max_workers=0, state_ttl=0.05)
+    calls: t.List[str] = []
+    state = "off"
+
+    async def get_state() -> str:
+        calls.append(state)
+        return state
+
+    plugin.get_state = get_state  # type: ignore
+
+    async def run() -> None:
+        nonlocal state
+        assert await runner.get_state(plugin) == "off"
+        assert await runner.get_state(plugin) == "off"
+        assert len(calls) == 1
+
+        # A successful action updates the cache without calling `get_state`
+        assert await runner.call(plugin, "on") is True
+        assert await runner.get_state(plugin) == "on"
+        assert len(calls) == 1
+
+        # Once expired, the stale state is served while a refresh runs
+        state = "off"
+        await asyncio.sleep(0.1)
+        assert await runner.get_state(plugin) == "on"
+        await asyncio.sleep(0.01)
+        assert len(calls) == 2
+        assert await runner.get_state(plugin) == "off"
+
+    asyncio.run(run())
+
+
+def test_metrics(
+    device_server: t.Callable[..., t.AsyncContextManager[int]]
+) -> None:
+    """Test that requests are counted and timed, and can be scraped."""
+    plugin = AsyncFakeStatePlugin(name="measured", port=0, initial_state="on")
+    get_state_request = (
+        b"POST /upnp/control/basicevent1 HTTP/1.1\r\n"
+        b'SOAPACTION: "urn:Belkin:service:basicevent:1#GetBinaryState"\r\n'
+        b"Content-Length: 0\r\n"
+        b"\r\n"
+    )
+    made_up_request = get_state_request.replace(
+        b"GetBinaryState", b"MadeUpAction"
+    )
+
+    async def run() -> t.Tuple[t.List[bytes], bytes]:
+        loop = asyncio.get_running_loop()
+        metrics_server = await loop.create_server(
+            metrics.MetricsServer, host="127.0.0.1", port=0
+        )
+        metrics_port = metrics_server.sockets[0].getsockname()[1]
+
+        responses = []
+        async with device_server(plugin) as port:
+            for request_port, request in [
+                (port, get_state_request),
+                (port, made_up_request),
+                (metrics_port, b"GET /nope HTTP/1.1\r\n\r\n"),
+                (metrics_port, b"GET /metrics HTTP/1.1\r\n\r\n"),
+            ]:
+                reader, writer = await asyncio.open_connection(
+                    "127.0.0.1", request_port
+                )
+                writer.write(request)
+                responses.append(await asyncio.wait_for(reader.read(), 1))
+                writer.close()
+
+        metrics_server.close()
+        await metrics_server.wait_closed()
+        return responses, metrics.render()
+
+    responses, rendered = asyncio.run(run())
+    assert b"<BinaryState>1</BinaryState>" in responses[0]
+    assert responses[1] == b""
+    assert responses[2].startswith(b"HTTP/1.1 404 Not Found")
+    scrape = responses[3]
+    assert scrape.startswith(b"HTTP/1.1 200 OK")
+    assert b"text/plain; version=0.0.4" in scrape
+    assert (
+        b'fauxmo_requests_total{device="measured",action="getbinarystate"} 1'
+        in rendered
+    )
+    assert (
+        b"fauxmo_request_duration_seconds_count"
+        b'{device="measured",action="getbinarystate"} 1' in rendered
+    )
+    assert (
+        b'fauxmo_plugin_calls_total{plugin="AsyncFakeStatePlugin",'
+        b'method="get_state"}' in rendered
+    )
+    assert b"madeupaction" not in rendered
+    assert (
+        b'fauxmo_request_errors_total{device="measured",action="unknown"} 1'
+        in rendered
+    )
+
+
+def test_histogram() -> None:
+    """Test that histogram buckets are rendered cumulatively."""
+    histogram = metrics.Histogram(
+        "test_seconds", "Test histogram.", ("label",), buckets=(0.1, 1.0)
+    )
+    metrics.REGISTRY.remove(histogram)
+    for value in (0.05, 0.5, 0.5, 5.0):
+        histogram.observe(value, 'quoted "value"')
+
+    assert histogram.samples() == [
+        'test_seconds_bucket{label="quoted \\"value\\"",le="0.1"} 1.0',
+        'test_seconds_bucket{label="quoted \\"value\\"",le="1.0"} 3.0',
+        'test_seconds_bucket{label="quoted \\"value\\"",le="+Inf"} 4.0',
+        'test_seconds_sum{label="quoted \\"value\\""} 6.05',
+        'test_seconds_count{label="quoted \\"value\\""} 4.0',
+    ]
+
+
 def test_get_unused_port() -> None:
     """
     Test get_unused_port function in utils.py.
@@ -125,3 +540,139 @@ def test_get_unused_port() -> None:
     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
         sock.bind(("", available_port))
         assert int(sock.getsockname()[1]) == available_port
+
+
+@pytest.mark.skipif(
+    not hasattr(socket, "if_nameindex"), reason="Interfaces not available"
+)
+def test_select_interfaces() -> None:
+    """Test looking up interfaces by name."""
+    interfaces = get_interfaces()
+    assert interfaces
+    assert all(interface.network for interface in interfaces)
+
+    names = [interface.name for interface in interfaces]
+    assert select_interfaces(names[:1]) == interfaces[:1]
+    assert select_interfaces(names[0]) == interfaces[:1]
+    assert all(
+        not interface.network.is_loopback
+        for interface in select_interfaces("all")
+    )
+    with pytest.raises(ValueError):
+        select_interfaces(["not-an-interface"])
+
+
+@pytest.mark.skipif(
+    not sys.platform.startswith("linux"), reason="Linux-only socket filter"
+)
+def test_attach_search_filter() -> None:
+    """Test that the kernel filter only lets SSDP searches through."""
+    with socket.socket(
+        socket.AF_INET, socket.SOCK_DGRAM
+    ) as receiver, socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sender:
+        receiver.bind(("127.0.0.1", 0))
+        receiver.settimeout(1)
+        assert attach_search_filter(receiver)
+
+        for data in (
+            b"NOTIFY * HTTP/1.1\r\nNTS: ssdp:alive\r\n\r\n",
+            b"M-SE",
+            b"M-SEARCH * HTTP/1.1\r\nST: ssdp:all\r\n\r\n",
+        ):
+            sender.sendto(data, receiver.getsockname())
+        assert receiver.recv(4096).startswith(b"M-SEARCH")
+
+
+def test_start_server() -> None:
+    """Test that servers bound to port 0 share the port across hosts."""
+    hosts = ["127.0.0.1"]
+    if socket.has_ipv6:
+        hosts.append("::1")
+
+    async def run() -> t.Tuple[int, t.Set[int]]:
+        servers, port = await fauxmo.start_server(asyncio.Protocol, hosts, 0)
+        ports = {
+            sock.getsockname()[1]
+            for server in servers
+            for sock in server.sockets
+        }
+        for server in servers:
+            server.close()
+            await server.wait_closed()
+        return port, ports
+
+    port, ports = asyncio.run(run())
+    assert port != 0
+    assert ports == {port}
+
+
+@pytest.mark.skipif(
+    not sys.platform.startswith("linux"), reason="Requires 127.0.0.2"
+)
+def test_start_server_retry(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that another port is tried if one is taken on another host."""
+    hosts = ["127.0.0.1", "127.0.0.2"]
+    calls: t.List[t.Tuple[t.Any, int]] = []
+    failures = 2
+    create_server: t.Callable[
+        ..., t.Awaitable[asyncio.Server]
+    ] = asyncio.BaseEventLoop.create_server
+
+    async def flaky_create_server(
+        loop: asyncio.BaseEventLoop,
+        *args: t.Any,
+        host: t.Any,
+        port: int,
+        **kwargs: t.Any,
+    ) -> asyncio.Server:
+        calls.append((host, port))
+        if isinstance(host, list) and len(calls) <= 2 * failures:
+            raise OSError(errno.EADDRINUSE, "Address already in use")
+        return await create_server(loop, *args, host=host, port=port, **kwargs)
+
+    monkeypatch.setattr(
+        asyncio.BaseEventLoop, "create_server", flaky_create_server
+    )
+
+    async def run() -> t.Tuple[t.List[asyncio.Server], int]:
+        servers, port = await fauxmo.start_server(asyncio.Protocol, hosts, 0)
+        for server in servers:
+            server.close()
+            await server.wait_closed()
+        return servers, port
+
+    servers, port = asyncio.run(run())
+    assert len(servers) == 2
+    assert [host for host, _ in calls] == [hosts[0], hosts[1:]] * 3
+    assert [port for _, port in calls[::2]] == [0, 0, 0]
+    assert calls[-1][1] == port
+
+    calls.clear()
+    failures = fauxmo.PORT_ATTEMPTS
+    with pytest.raises(OSError):
+        asyncio.run(run())
+    assert len(calls) == 2 * fauxmo.PORT_ATTEMPTS
+
+
+def test_lazy_imports() -> None:
+    """Test that plugins and their dependencies aren't imported up front."""
+    modules = subprocess.run(
+        [sys.executable, "-c", "import sys, fauxmo.cli; print(*sys.modules)"],
+        capture_output=True,
+        check=True,
+        text=True,
+    ).stdout.split()
+
+    assert "fauxmo.fauxmo" in modules
+    for module in (
+        "fauxmo.plugins.simplehttpplugin",
+        "fauxmo.plugins.commandlineplugin",
+        "fauxmo.plugins.homeassistantplugin",
+        "fauxmo.supervisor",
+        "fauxmo.admission",
+        "fauxmo.announcer",
+        "urllib.request",
+        "http.cookiejar",
+        "email.utils",
+    ):
+        assert module not in modules
@@ -0,0 +1,88 @@
+"""test_parser.py :: Tests for Fauxmo's incremental HTTP request parser."""
+
+import pytest
+
+from fauxmo.parser import HTTPRequestParser, parse_search, ParseError
+
+set_state_request = (
+    b"POST /upnp/control/basicevent1 HTTP/1.1\r\n"
+    b"Host: 192.168.1.5:12345\r\n"
+    b"Content-Type: text/xml; charset=utf-8\r\n"
+    b'SOAPACTION: "urn:Belkin:service:basicevent:1#SetBinaryState"\r\n'
+    b"Content-Length: 28\r\n"
+    b"\r\n"
+    b"<BinaryState>1</BinaryState>"
+)
+
+
+def test_request_split_across_segments() -> None:
+    """Ensure nothing is dispatched until the body is complete."""
+    parser = HTTPRequestParser()
+    *head, last = (bytes([byte]) for byte in set_state_request)
+    for segment in head:
+        assert parser.feed(segment) == []
+
+    (request,) = parser.feed(last)
+    assert request.method == "POST"
+    assert request.path == "/upnp/control/basicevent1"
+    assert request.headers["soapaction"].endswith('#SetBinaryState"')
+    assert request.body == b"<BinaryState>1</BinaryState>"
+
+
+def test_pipelined_requests() -> None:
+    """Ensure several requests in a single segment are all returned."""
+    setup_request = b"GET /setup.xml HTTP/1.1\r\nHost: fauxmo\r\n\r\n"
+    parser = HTTPRequestParser()
+
+    requests = parser.feed(setup_request + set_state_request + setup_request)
+    assert [r.path for r in requests] == [
+        "/setup.xml",
+        "/upnp/control/basicevent1",
+        "/setup.xml",
+    ]
+    assert requests[0].body == b""
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        b"GET /setup.xml\r\n\r\n",
+        b"GET /setup.xml HTTP/1.1\r\nbad header\r\n\r\n",
+        b"POST / HTTP/1.1\r\nContent-Length: -1\r\n\r\n",
+        b"POST / HTTP/1.1\r\nContent-Length: \xb2\r\n\r\n",
+        b"POST / HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n",
+        b"GET / HTTP/1.1\r\n" + b"X: y\r\n" * 2000,
+        b"GET / HTTP/1.1\r\n" + b"X: y\r\n" * 2000 + b"\r\n",
+    ],
+)
+def test_malformed_requests(data: bytes) -> None:
+    """Ensure malformed or oversized requests raise ParseError."""
+    with pytest.raises(ParseError):
+        HTTPRequestParser().feed(data)
+
+
+def test_parse_search() -> None:
+    """Test parsing of SSDP searches, and rejection of other datagrams."""
+    search = parse_search(
+        b"M-SEARCH * HTTP/1.1\r\n"
+        b"HOST: 239.255.255.250:1900\r\n"
+        b'man: "ssdp:discover"\r\n'
+        b"MX: 3\r\n"
+        b"st: urn:Belkin:device:**\r\n"
+        b"\r\n"
+    )
+    assert search == ("M-SEARCH", "urn:Belkin:device:**", '"ssdp:discover"', 3)
+
+    # Headers also found with bare newlines, and a bad MX ignored
+    search = parse_search(b"M-SEARCH * HTTP/1.1\nMX: soon\nST: ssdp:all\n")
+    assert search is not None
+    assert (search.search_target, search.man, search.mx) == ("ssdp:all", "", 0)
+
+    assert parse_search(b"M-SEARCH * HTTP/1.1\r\nMX: 1\r\n\r\n") is None
+    assert (
+        parse_search(
+            b"NOTIFY * HTTP/1.1\r\nNT: upnp:rootdevice\r\n"
+            b"NTS: ssdp:alive\r\n\r\n"
+        )
+        is None
+    )
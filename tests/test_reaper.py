@@ -0,0 +1,76 @@
+"""test_reaper.py :: Tests for reaping stalled and idle connections."""
+
+import asyncio
+import typing as t
+
+from fauxmo import metrics
+from fauxmo.reaper import ConnectionReaper
+
+
+class FakeConnection:
+    """Records why it was reaped."""
+
+    def __init__(self) -> None:
+        """Initialize a FakeConnection."""
+        self.reaped: t.List[str] = []
+
+    def reap(self, reason: str) -> None:
+        """Record the reason."""
+        self.reaped.append(reason)
+
+
+def test_connection_reaper() -> None:
+    """Test that only connections past their deadline are reaped."""
+    reaper = ConnectionReaper(resolution=0.01)
+    expiring, rescheduled, cancelled = (FakeConnection() for _ in range(3))
+
+    async def run() -> None:
+        reaper.schedule(expiring, 0.02, "idle")
+        reaper.schedule(rescheduled, 0.02, "idle")
+        reaper.schedule(cancelled, 0.02, "idle")
+        reaper.schedule(rescheduled, 1, "request_timeout")
+        reaper.cancel(cancelled)
+        assert len(reaper) == 2
+
+        await asyncio.sleep(0.1)
+        assert len(reaper) == 1
+        assert reaper.reason(rescheduled) == "request_timeout"
+        reaper.close()
+
+    asyncio.run(run())
+    assert expiring.reaped == ["idle"]
+    assert rescheduled.reaped == cancelled.reaped == []
+
+
+def test_slow_client(
+    device_server: t.Callable[..., t.AsyncContextManager[int]]
+) -> None:
+    """Test that a client trickling in a request is closed at its deadline."""
+    reaper = ConnectionReaper(resolution=0.05)
+    before = metrics.connections_reaped_total.values.get(("request_timeout",))
+
+    async def run() -> t.Optional[bytes]:
+        async with device_server(
+            name="slow client", request_timeout=0.2, reaper=reaper
+        ) as port:
+            # Sends nothing at all
+            _, silent_writer = await asyncio.open_connection("127.0.0.1", port)
+
+            # Sends a byte every 50 ms, which would never complete in time
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            received = None
+            for byte in b"GET /setup.xml HTTP/1.1\r\n\r\n":
+                writer.write(bytes([byte]))
+                try:
+                    received = await asyncio.wait_for(reader.read(), 0.05)
+                    break
+                except asyncio.TimeoutError:
+                    continue
+
+            silent_writer.close()
+            writer.close()
+        return received
+
+    assert asyncio.run(run()) == b""
+    after = metrics.connections_reaped_total.values[("request_timeout",)]
+    assert after == (before or 0) + 2
@@ -0,0 +1,44 @@
+"""test_scheduler.py :: Tests for the SSDP response scheduler."""
+
+import asyncio
+import typing as t
+
+from fauxmo.responses import SearchResponse
+from fauxmo.scheduler import Address, ResponseScheduler
+
+
+def test_response_scheduler() -> None:
+    """Test that responses are sent in order of delay, in paced bursts."""
+    sent: t.List[t.Tuple[float, bytes, Address]] = []
+    addr = ("10.0.0.3", 50000)
+
+    async def run() -> ResponseScheduler:
+        loop = asyncio.get_running_loop()
+        scheduler = ResponseScheduler(
+            lambda data, addr: sent.append((loop.time(), data, addr)),
+            max_burst=4,
+            pace_interval=0.01,
+        )
+        for idx in range(1, 9):
+            response = SearchResponse("x", idx, "serial", "ssdp:all")
+            scheduler.schedule(0.05, response, addr)
+
+        # Scheduled last but due first, which reschedules the timer
+        response = SearchResponse("x", 0, "serial", "ssdp:all")
+        scheduler.schedule(0.02, response, addr)
+        assert len(scheduler) == 9
+
+        await asyncio.sleep(0.2)
+        return scheduler
+
+    scheduler = asyncio.run(run())
+    assert len(scheduler) == 0
+    assert [
+        data.split(b"LOCATION: http://x:")[1][:1] for _, data, _ in sent
+    ] == [str(idx).encode() for idx in range(9)]
+
+    # Then bursts of 4 and 4, at least `pace_interval` apart
+    times = [when for when, _, _ in sent]
+    assert times[1] - times[0] >= 0.02
+    assert times[4] - times[1] < 0.01
+    assert times[5] - times[1] >= 0.01
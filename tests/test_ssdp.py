@@ -0,0 +1,177 @@
+"""test_ssdp.py :: Tests for answering and announcing over SSDP."""
+
+import asyncio
+import typing as t
+
+from fauxmo import metrics
+from fauxmo.protocols import SSDPServer
+from fauxmo.responses import (
+    DEVICE_TYPE,
+    device_uuid,
+    SSDP_GROUP_V6,
+    SSDP_GROUP_V6_SITE,
+)
+from fauxmo.scheduler import Address
+from fauxmo.utils import Interface, make_serial
+
+
+class FakeDatagramTransport:
+    """Records sent datagrams."""
+
+    def __init__(self) -> None:
+        """Initialize a FakeDatagramTransport."""
+        self.sent: t.List[t.Tuple[bytes, Address]] = []
+
+    def sendto(self, data: bytes, addr: Address) -> None:
+        """Record a datagram."""
+        self.sent.append((data, addr))
+
+
+def test_duplicate_searches() -> None:
+    """Test that repeated searches are ignored and the queue is capped."""
+    server = SSDPServer(max_pending=5)
+    for idx in range(3):
+        server.add_device(f"duplicate {idx}", "10.0.0.2", 50000 + idx)
+    transport = FakeDatagramTransport()
+    server.transport = t.cast(asyncio.DatagramTransport, transport)
+    first, second = ("10.0.0.3", 50000), ("10.0.0.4", 50000)
+
+    suppressed = metrics.ssdp_responses_suppressed_total.values.get((), 0)
+    dropped = metrics.ssdp_responses_dropped_total.values.get((), 0)
+
+    async def run() -> None:
+        server.respond_to_search(first, "ssdp:all", 0.05)
+        server.respond_to_search(first, "ssdp:all", 0.05)
+        server.respond_to_search(second, "ssdp:all", 0.05)
+        assert len(server.scheduler) == 5
+        await asyncio.sleep(0.1)
+
+        # Answered again once the first round is complete
+        server.respond_to_search(first, "ssdp:all", 0.05)
+        await asyncio.sleep(0.1)
+
+    asyncio.run(run())
+    assert [addr for _, addr in transport.sent].count(first) == 6
+    assert [addr for _, addr in transport.sent].count(second) == 2
+    assert metrics.ssdp_responses_suppressed_total.values[()] == suppressed + 3
+    assert metrics.ssdp_responses_dropped_total.values[()] == dropped + 1
+
+
+def test_recent_searches_limit() -> None:
+    """Test that remembered searches expire and are capped."""
+    server = SSDPServer()
+    server.max_recent_searches = 2
+    server.add_device("limited", "10.0.0.2", 50000)
+    transport = FakeDatagramTransport()
+    server.transport = t.cast(asyncio.DatagramTransport, transport)
+    searchers = [(f"10.0.0.{idx}", 50000) for idx in range(3, 6)]
+
+    async def run() -> None:
+        for addr in searchers + searchers:
+            server.respond_to_search(addr, "ssdp:all", 0.05)
+        assert len(server._recent_searches) == 2
+        await asyncio.sleep(0.1)
+
+        # Expired searches are forgotten as the next search arrives
+        server.respond_to_search(searchers[0], "ssdp:all", 0)
+        assert len(server._recent_searches) == 1
+        await asyncio.sleep(0.01)
+
+    asyncio.run(run())
+    sent_to = [addr for _, addr in transport.sent]
+    assert [sent_to.count(addr) for addr in searchers] == [2, 1, 2]
+
+
+def test_targeted_search() -> None:
+    """Test that a search for a device's UUID is answered by that device."""
+    server = SSDPServer()
+    for idx in range(3):
+        server.add_device(f"targeted {idx}", "10.0.0.2", 50000 + idx)
+    transport = FakeDatagramTransport()
+    server.transport = t.cast(asyncio.DatagramTransport, transport)
+    target = device_uuid(make_serial("targeted 1"))
+
+    async def run() -> None:
+        for search_target in (target, DEVICE_TYPE, "uuid:unknown"):
+            server.datagram_received(
+                (
+                    "M-SEARCH * HTTP/1.1\r\n"
+                    "HOST: 239.255.255.250:1900\r\n"
+                    'MAN: "ssdp:discover"\r\n'
+                    "MX: 0\r\n"
+                    f"ST: {search_target}\r\n"
+                    "\r\n"
+                ).encode(),
+                ("10.0.0.3", 50000),
+            )
+        await asyncio.sleep(0.05)
+
+    asyncio.run(run())
+    assert len(transport.sent) == 4
+    targeted = transport.sent[0][0]
+    assert b"LOCATION: http://10.0.0.2:50001/setup.xml\r\n" in targeted
+    assert f"USN: {target}\r\n".encode() in targeted
+
+
+def test_interface_location() -> None:
+    """Test that searches are answered with the searcher's interface."""
+    interfaces = [
+        Interface("eth0", "10.0.0.2", "255.255.255.0"),
+        Interface("wlan0", "192.168.1.2", "255.255.0.0"),
+    ]
+    server = SSDPServer(announce=True, interfaces=interfaces)
+    server.add_device("multihomed", "10.0.0.2", 50000)
+    transport = FakeDatagramTransport()
+    server.transport = t.cast(asyncio.DatagramTransport, transport)
+
+    assert server.location_host("192.168.7.7") == b"192.168.1.2"
+    assert server.location_host("172.16.0.1") is None
+    assert server.location_host("::1") is None
+
+    async def run() -> None:
+        for addr in ("10.0.0.3", "192.168.7.7", "172.16.0.1"):
+            server.respond_to_search((addr, 50000), "upnp:rootdevice", 0)
+        await asyncio.sleep(0.02)
+
+    asyncio.run(run())
+    assert [
+        data.split(b"LOCATION: ")[1].split(b"\r\n")[0]
+        for data, _ in transport.sent
+    ] == [
+        b"http://10.0.0.2:50000/setup.xml",
+        b"http://192.168.1.2:50000/setup.xml",
+        b"http://10.0.0.2:50000/setup.xml",
+    ]
+
+    # Announced once from each interface
+    assert server.announcer is not None
+    assert len(server.announcer.alive) == 2
+    assert b"LOCATION: http://192.168.1.2:50000/setup.xml\r\n" in (
+        server.announcer.alive[1][0]
+    )
+
+
+def test_ipv6_search() -> None:
+    """Test answering and announcing with bracketed IPv6 locations."""
+    server = SSDPServer(
+        announce=True, groups=[SSDP_GROUP_V6, SSDP_GROUP_V6_SITE]
+    )
+    server.add_device("ipv6", "fd00::2", 50000)
+    transport = FakeDatagramTransport()
+    server.transport = t.cast(asyncio.DatagramTransport, transport)
+    addr = t.cast(Address, ("fd00::3", 50000, 0, 0))
+
+    async def run() -> None:
+        server.respond_to_search(addr, "upnp:rootdevice", 0)
+        await asyncio.sleep(0.02)
+
+    asyncio.run(run())
+    assert transport.sent[0][1] == addr
+    assert b"LOCATION: http://[fd00::2]:50000/setup.xml\r\n" in (
+        transport.sent[0][0]
+    )
+
+    # Announced to each group, with the group in `HOST`
+    assert server.announcer is not None
+    assert server.announcer.addresses == [("ff02::c", 1900), ("ff05::c", 1900)]
+    assert b"HOST: [ff05::c]:1900\r\n" in server.announcer.alive[1][0]
@@ -0,0 +1,85 @@
+"""test_supervisor.py :: Tests for running Fauxmo in worker processes."""
+
+import pathlib
+import subprocess
+import sys
+import time
+
+import pytest
+
+from fauxmo.supervisor import Supervisor
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="Requires os.fork")
+def test_supervisor(tmp_path: pathlib.Path) -> None:
+    """Test that a crashed worker is restarted and clean exits are not."""
+    log = tmp_path / "workers.log"
+    crashed = tmp_path / "crashed"
+
+    def target(worker: int) -> None:  # pragma: no cover
+        with log.open("a") as f:
+            f.write(f"{worker}\n")
+        if worker == 1 and not crashed.exists():
+            crashed.touch()
+            raise RuntimeError("Worker crashed")
+
+    supervisor = Supervisor(target, workers=3, restart_delay=0)
+    assert supervisor.run() == 0
+
+    assert sorted(log.read_text().split()) == ["0", "1", "1", "2"]
+    assert supervisor.pids == {}
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="Requires os.fork")
+def test_supervisor_gives_up(tmp_path: pathlib.Path) -> None:
+    """Test that a worker failing to start is retried with backoff, then not.
+
+    The healthy worker is stopped when the supervisor gives up.
+    """
+    log = tmp_path / "workers.log"
+
+    def target(worker: int) -> None:  # pragma: no cover
+        with log.open("a") as f:
+            f.write(f"{worker} {time.monotonic()}\n")
+        if worker == 1:
+            raise RuntimeError("Worker failed to start")
+        time.sleep(30)
+
+    supervisor = Supervisor(
+        target, workers=2, restart_delay=0.05, max_failures=4
+    )
+    start = time.monotonic()
+    assert supervisor.run() == 1
+    assert time.monotonic() - start < 10
+
+    starts = [
+        float(line.split()[1])
+        for line in log.read_text().splitlines()
+        if line.startswith("1 ")
+    ]
+    assert len(starts) == 4
+    gaps = [later - earlier for earlier, later in zip(starts, starts[1:])]
+    assert gaps[0] >= 0.05
+    assert gaps[1] >= 0.1
+    assert gaps[2] >= 0.2
+    assert supervisor.pids == {}
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="Requires os.fork")
+def test_workers_missing_config() -> None:
+    """Test that `--workers` with a missing config exits instead of looping."""
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            "fauxmo.cli",
+            "-c",
+            "/nonexistent.json",
+            "-w",
+            "2",
+        ],
+        capture_output=True,
+        timeout=30,
+    )
+    assert result.returncode != 0
+    assert b"Started worker" not in result.stderr